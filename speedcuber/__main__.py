@@ -0,0 +1,57 @@
+""" Solves a stream of cubes from the command line
+
+    python -m speedcuber [cubes.jsonl] [-o solutions.jsonl]
+
+reads one cube per line (the format of Cube.dump(), with an optional
+"id") from the file, or standard input, and writes one JSON result per
+line (see speedcuber.bulk).
+
+"""
+
+# From Python Standard Library
+import sys
+import argparse
+
+from speedcuber.bulk import METHODS, solve_stream
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m speedcuber",
+        description="Solves cubes read as JSON lines, one per line.")
+    parser.add_argument("input", nargs="?", default="-",
+                        help="file to read the cubes from (default: stdin)")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write the results to (default: stdout)")
+    parser.add_argument("-m", "--method", default="twophase",
+                        choices=sorted(METHODS),
+                        help="solver used (default: twophase)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="worker processes (default: one per CPU)")
+    parser.add_argument("--window", type=int, default=None,
+                        help="cubes handed to the workers at a time")
+    parser.add_argument("-u", "--unordered", action="store_true",
+                        help="write results as soon as they are ready")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite file of solutions already found, "
+                             "shared by the workers and kept between runs")
+    arguments = parser.parse_args(arguments)
+
+    input_file  = sys.stdin  if arguments.input  == "-" else \
+                  open(arguments.input, 'r')
+    output_file = sys.stdout if arguments.output == "-" else \
+                  open(arguments.output, 'w')
+    try:
+        for result in solve_stream(input_file, arguments.workers,
+                                   not arguments.unordered, arguments.method,
+                                   arguments.window, arguments.cache):
+            output_file.write(result + "\n")
+    finally:
+        if input_file is not sys.stdin:
+            input_file.close()
+        if output_file is not sys.stdout:
+            output_file.close()
+
+
+if __name__ == "__main__":
+    main()
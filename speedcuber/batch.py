@@ -0,0 +1,106 @@
+# External dependancy
+import numpy as np
+
+from speedcuber.cube import Cube, MOVES, canonical_successors
+
+# The permutation of every move, in the order of Cube.rotation_types, so a
+# vector of move indices selects one permutation per cube.
+MOVE_TABLE = np.stack([MOVES[move] for move in Cube.rotation_types])
+MOVE_TABLE.flags.writeable = False
+
+# Index standing for "no move" when a sequence is shorter than two moves
+NO_MOVE = len(Cube.rotation_types)
+
+def _canonical_table():
+    """ canonical_successors() as a mask indexed by move indices
+
+    [before_last, last, move] is True when move can follow the moves
+    before_last and last in a canonical sequence.
+
+    """
+
+    letters = Cube.rotation_types + ['']
+    successors = canonical_successors(Cube.rotation_types)
+    table = np.zeros((NO_MOVE+1, NO_MOVE+1, NO_MOVE), dtype=bool)
+    for i, before_last in enumerate(letters):
+        for j, last in enumerate(letters):
+            for move in successors[(before_last, last)]:
+                table[i, j, Cube.rotation_types.index(move)] = True
+    table.flags.writeable = False
+    return table
+
+CANONICAL = _canonical_table()
+
+
+def move_indices(moves):
+    """ Converts a move, a string or a vector of moves to move indices
+
+    Moves can be given as letters of Cube.rotation_types or directly as
+    indices into it.
+
+    """
+
+    if isinstance(moves, str):
+        moves = list(moves)
+    moves = np.asarray(moves)
+    if moves.dtype.kind in 'US':
+        moves = np.array([Cube.rotation_types.index(move)
+                          for move in moves.astype(str).ravel()],
+                         dtype=np.intp).reshape(moves.shape)
+    return moves.astype(np.intp)
+
+def stack(cubes):
+    """ Packs a list of Cubes into an (N, 54) array of states """
+
+    return np.stack([cube.state for cube in cubes])
+
+def unstack(states):
+    """ Unpacks an (N, 54) array of states into a list of Cubes """
+
+    cubes = []
+    for state in np.asarray(states, dtype=np.uint8):
+        cube = Cube()
+        cube.state = state.copy()
+        cubes.append(cube)
+    return cubes
+
+def apply_moves(states, moves):
+    """ Applies a move to every cube of an (N, 54) array of states
+
+    moves is either a single move, applied to all the cubes, or a vector
+    of N moves, one for each cube. The N successor states are returned
+    as a new array, computed with a single gather.
+
+    """
+
+    states = np.asarray(states)
+    if isinstance(moves, str) and len(moves) == 1:
+        try:
+            return states[:, MOVES[moves]]
+        except(KeyError):
+            raise(ValueError)
+    permutations = MOVE_TABLE[move_indices(moves)]
+    if permutations.ndim == 1:
+        return states[:, permutations]
+    return np.take_along_axis(states, permutations, axis=1)
+
+def successors(states):
+    """ Applies every move to every cube of an (N, 54) array of states
+
+    Returns an (N, 12, 54) array where [i, j] is the i-th cube after the
+    j-th move of Cube.rotation_types, so a whole search frontier can be
+    expanded at once.
+
+    """
+
+    return np.asarray(states)[:, MOVE_TABLE]
+
+def is_solved(states):
+    """ Vectorised Cube.is_solved() over an (N, 54) array of states
+
+    Returns a boolean mask with one element per cube.
+
+    """
+
+    sides = np.asarray(states).reshape(-1, 6, 9)
+    return (sides == sides[:, :, 4:5]).all(axis=(1, 2))
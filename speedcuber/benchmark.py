@@ -0,0 +1,221 @@
+""" Benchmarks of the Cube operations and of the simple solvers
+
+    python -m speedcuber.benchmark [-o results.json] [--compare old.json]
+
+times every motion, the solved checks and the copies, then solves seeded
+scrambles of every depth (1 to 6 by default) with solve_cpu_singlethread(),
+solve_dfs() and solve_mem_singlethread(), measuring their time and peak
+memory.
+
+The results are written as JSON, and can be compared with the results of
+a previous run: every measure that got slower (or bigger) by more than a
+threshold is reported, and the exit status is 1 if there is any. Times
+are the best of a few runs, and their threshold is widened by the spread
+of those runs, so noisy measures aren't reported as regressions.
+
+"""
+
+# From Python Standard Library
+import sys
+import json
+import timeit
+import random
+import argparse
+import platform
+import tracemalloc
+from copy import deepcopy
+
+# External dependancy
+import numpy as np
+
+from speedcuber.cube import Cube, canonical_successors
+
+FORMAT = 1
+# Scrambles solved per depth, and default depths
+SCRAMBLES = 3
+DEPTHS    = range(1, 7)
+# Runs of every solve, the best one is kept
+REPEATS   = 3
+# Slowdown reported unless told otherwise
+THRESHOLD = 0.1
+SOLVERS   = ('solve_cpu_singlethread', 'solve_dfs',
+             'solve_mem_singlethread')
+
+
+def scramble(depth, rng):
+    """ A random canonical sequence of depth moves """
+
+    successors = canonical_successors(Cube.rotation_types)
+    moves = ''
+    for _ in range(depth):
+        moves += rng.choice(successors[(moves[-2:-1], moves[-1:])])
+    return moves
+
+def timings(function, number, repeat=5):
+    """ Seconds per call of function, the best of repeat runs, and spread
+
+    spread is (slowest - best) / best, how much the runs vary.
+
+    """
+
+    runs = timeit.repeat(function, number=number, repeat=repeat)
+    return min(runs) / number, max(runs) / min(runs) - 1
+
+def operations(number=20000):
+    """ Seconds per call of every motion, solved check and copy
+
+    Returns them, and the spread of their runs (see timings()).
+
+    """
+
+    cube = Cube()
+    cube.MOTION('F')
+    side      = cube.front
+    functions = dict()
+    for move in Cube.rotation_types:
+        functions['MOTION ' + move] = lambda move=move: cube.MOTION(move)
+    functions['motion']         = lambda: cube.motion('F')
+    functions['is_solved']      = cube.is_solved
+    functions['is_side_solved'] = lambda: cube.is_side_solved(side)
+    functions['copy']           = cube.copy
+    functions['deepcopy']       = lambda: deepcopy(cube)
+    results = dict()
+    spreads = dict()
+    for name, function in functions.items():
+        results[name], spreads[name] = timings(function, number)
+    return results, spreads
+
+def solvers(depths=DEPTHS, scrambles=SCRAMBLES, seed=0, repeat=REPEATS):
+    """ Time and peak memory of the solvers at every scramble depth
+
+    Every depth solves the same scrambles (from seed) with every solver
+    and reports the mean seconds (of the best of repeat runs), the mean
+    spread of those runs (see timings()), the largest peak of
+    memory allocated (in bytes), and the mean attempts and solution
+    length.
+
+    Every solver first solves a cube once untimed, so what it imports
+    and builds on its first call isn't counted in the first depth.
+
+    """
+
+    results = dict()
+    for solver in SOLVERS:
+        warm_up = Cube()
+        warm_up.MOTION('F')
+        getattr(warm_up, solver)()
+        results[solver] = dict()
+        for depth in depths:
+            rng = random.Random("%d-%d" % (seed, depth))
+            measures = []
+            for _ in range(scrambles):
+                cube = Cube()
+                for move in scramble(depth, rng):
+                    cube.MOTION(move)
+                # timed without tracemalloc, which slows allocations down
+                seconds, spread = timings(getattr(cube, solver), 1, repeat)
+                tracemalloc.start()
+                moves, attempts = getattr(cube, solver)()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                measures.append((seconds, spread, peak, attempts, len(moves)))
+            seconds, spread, peak, attempts, length = zip(*measures)
+            results[solver][str(depth)] = {'seconds':  sum(seconds) / scrambles,
+                                           'spread':   sum(spread) / scrambles,
+                                           'peak_memory': max(peak),
+                                           'attempts': sum(attempts) / scrambles,
+                                           'length':   sum(length) / scrambles}
+    return results
+
+def run(depths=DEPTHS, scrambles=SCRAMBLES, seed=0, repeat=REPEATS):
+    """ Every benchmark, as a dictionary that can be stored as JSON """
+
+    seconds, spreads = operations()
+    return {'format':     FORMAT,
+            'python':     platform.python_version(),
+            'numpy':      np.__version__,
+            'machine':    platform.machine(),
+            'seed':       seed,
+            'scrambles':  scrambles,
+            'operations': seconds,
+            'operations_spread': spreads,
+            'solvers':    solvers(depths, scrambles, seed, repeat)}
+
+def compare(old, new, threshold=THRESHOLD):
+    """ The measures of new worse than old by more than threshold
+
+    Returns a list of (name, old value, new value). Only time and memory
+    measures are compared, and only the ones both results have. The
+    threshold of times is at least the spread of their runs in either
+    results, which is how much they vary from run to run.
+
+    """
+
+    regressions = []
+    for name, value in new['operations'].items():
+        if name not in old['operations']:
+            continue
+        noise = max(new.get('operations_spread', dict()).get(name, 0),
+                    old.get('operations_spread', dict()).get(name, 0))
+        if value > old['operations'][name] * (1 + max(threshold, noise)):
+            regressions.append((name, old['operations'][name], value))
+    for solver, depths in new['solvers'].items():
+        for depth, measures in depths.items():
+            previous = old['solvers'].get(solver, dict()).get(depth)
+            if previous is None:
+                continue
+            noise = max(measures.get('spread', 0), previous.get('spread', 0))
+            for measure, allowed in (('seconds', max(threshold, noise)),
+                                     ('peak_memory', threshold)):
+                if measures[measure] > previous[measure] * (1 + allowed):
+                    regressions.append(("%s depth %s %s" % (solver, depth,
+                                                            measure),
+                                        previous[measure], measures[measure]))
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(prog="python -m speedcuber.benchmark",
+                                     description="Benchmarks speedcuber.")
+    parser.add_argument("-o", "--output", default="-",
+                        help="file to write the results to (default: stdout)")
+    parser.add_argument("--compare", default=None,
+                        help="results of a previous run to compare with")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="slowdown reported by --compare, at least the "
+                             "spread of the times (default: %g)"
+                             % THRESHOLD)
+    parser.add_argument("--max-depth", type=int, default=max(DEPTHS),
+                        help="deepest scrambles solved (default: %d)"
+                             % max(DEPTHS))
+    parser.add_argument("--scrambles", type=int, default=SCRAMBLES,
+                        help="scrambles per depth (default: %d)" % SCRAMBLES)
+    parser.add_argument("--repeat", type=int, default=REPEATS,
+                        help="runs of every solve, the best one is kept "
+                             "(default: %d)" % REPEATS)
+    parser.add_argument("--seed", type=int, default=0)
+    arguments = parser.parse_args(arguments)
+
+    results = run(range(1, arguments.max_depth + 1), arguments.scrambles,
+                  arguments.seed, arguments.repeat)
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if arguments.output == "-":
+        print(text)
+    else:
+        with open(arguments.output, 'w') as file_handle:
+            file_handle.write(text + "\n")
+
+    if arguments.compare is not None:
+        with open(arguments.compare, 'r') as file_handle:
+            old = json.load(file_handle)
+        regressions = compare(old, results, arguments.threshold)
+        for name, before, after in regressions:
+            print("%s: %.3g -> %.3g (%+.0f%%)"
+                  % (name, before, after, (after / before - 1) * 100),
+                  file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,139 @@
+""" Bidirectional (meet-in-the-middle) search
+
+The scrambled cube and the solved cube each grow a frontier of canonical
+move sequences, one depth at a time, until a state is reached from both
+sides. A solution of n motions is then found exploring about twice
+9.37^(n/2) states instead of 9.37^n.
+
+"""
+
+# External dependancy
+import numpy as np
+
+from speedcuber.cube  import Cube, invert_moves
+from speedcuber.batch import MOVE_TABLE, CANONICAL, NO_MOVE
+from speedcuber.stats import SearchStats
+
+# Frontier rows expanded at once, bounding the (rows, 12, 54) successors
+CHUNK_SIZE = 65536
+
+
+class _Side:
+    """ The states reached from one end of the search
+
+    seen maps every state reached (as bytes) to the moves reaching it.
+    The frontier keeps the states of the last depth with their moves and
+    the indices of their last two moves, to keep extending them
+    canonically.
+
+    """
+
+    def __init__(self, state):
+        self.seen        = {state.tobytes(): ''}
+        self.states      = state.reshape(1, 54)
+        self.moves       = ['']
+        self.before_last = np.array([NO_MOVE])
+        self.last        = np.array([NO_MOVE])
+        self.depth       = 0
+
+    def expand(self, other, max_states, stats):
+        """ Extends the frontier by one motion
+
+        Returns the moves of this side and of the other side reaching the
+        same state as soon as one is found, None otherwise. Past
+        max_states, the states reached are only checked against the other
+        side, and MemoryError is raised if none of them meets it.
+
+        """
+
+        states, moves, before_last, last = [], [], [], []
+        full = False
+        for start in range(0, len(self.moves), CHUNK_SIZE):
+            stop = start + CHUNK_SIZE
+            candidates = self.states[start:stop][:, MOVE_TABLE]
+            allowed    = CANONICAL[self.before_last[start:stop],
+                                   self.last[start:stop]]
+            rows, columns = np.nonzero(allowed)
+            stats.expand(len(allowed))
+            for row, column, state in zip(rows, columns,
+                                          candidates[rows, columns]):
+                stats.generate()
+                key = state.tobytes()
+                if key in self.seen:
+                    stats.duplicate()
+                    continue
+                sequence = self.moves[start+row] + \
+                           Cube.rotation_types[column]
+                if key in other.seen:
+                    return sequence, other.seen[key]
+                if max_states is not None and \
+                   len(self.seen) + len(other.seen) >= max_states:
+                    # no room to keep it, the next depth can't be tried
+                    full = True
+                    continue
+                self.seen[key] = sequence
+                states.append(state)
+                moves.append(sequence)
+                before_last.append(self.last[start+row])
+                last.append(column)
+        if full == True:
+            raise(MemoryError("more than %d states needed" % max_states))
+
+        self.states      = np.array(states, dtype=np.uint8).reshape(-1, 54)
+        self.moves       = moves
+        self.before_last = np.array(before_last, dtype=np.intp)
+        self.last        = np.array(last, dtype=np.intp)
+        self.depth      += 1
+        return None
+
+
+def solve_bidirectional(cube, max_states=None, stats=None):
+    """ Solves the Cube searching from both ends and outputs the move list
+
+    The frontier with the fewest states is always the one extended, and
+    the search stops at the first state reached from both ends. As every
+    depth of both frontiers is completed before the next one, the moves
+    found are the shortest (quarter turn) solution.
+
+    max_states bounds the number of states kept in memory (both sides
+    together). MemoryError is raised when the search would need more,
+    once the depth being extended is over without the sides meeting.
+
+    Returns the moves and the number of states stored, like the other
+    solvers return their attempts. The depths of stats are the motions
+    of both sides together.
+
+    """
+
+    stats    = stats if stats is not None else SearchStats()
+    forward  = _Side(cube.state)
+    solved   = np.repeat(cube.state[4::9], 9)
+    backward = _Side(solved)
+    stats.generate(2)
+    if forward.seen.keys() == backward.seen.keys():
+        stats.finish()
+        return '', 1
+
+    try:
+        while True:
+            stats.enter_depth(forward.depth + backward.depth + 1)
+            if len(forward.moves) <= len(backward.moves):
+                meeting = forward.expand(backward, max_states, stats)
+                if meeting is not None:
+                    forward_moves, backward_moves = meeting
+                    break
+            else:
+                meeting = backward.expand(forward, max_states, stats)
+                if meeting is not None:
+                    backward_moves, forward_moves = meeting
+                    break
+            stats.table_size(len(forward.seen) + len(backward.seen))
+            if len(forward.moves) == 0 or len(backward.moves) == 0:
+                # Every reachable state was visited from one end
+                raise(ValueError("the cube has no solution"))
+    finally:
+        stats.finish()
+
+    attempts = len(forward.seen) + len(backward.seen)
+    stats.table_size(attempts)
+    return forward_moves + invert_moves(backward_moves), attempts
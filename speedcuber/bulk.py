@@ -0,0 +1,121 @@
+""" Bulk solver: streams of cubes solved across worker processes
+
+Cubes are read as JSON lines, one cube per line in the format of
+Cube.dump() (a dictionary with an element for each side), with an
+optional "id" element. Every line is solved by a pool of worker
+processes and gives one result:
+
+    {"id": ..., "moves": "FRu", "length": 3}
+
+or, for a line that can't be read or solved:
+
+    {"id": ..., "error": "..."}
+
+A cube without an "id" is given its line number (from 0).
+
+With a cache file, every worker looks the cubes up in a SolutionCache
+(see speedcuber.solutions) sharing that file, so a cube already solved,
+in this run or a previous one, isn't searched again.
+
+Only a window of lines is handed to the workers at a time, so any
+number of cubes can be streamed through in constant memory. Results come
+out in the order of the lines, or as soon as they are ready when that
+order isn't needed (the ids tell them apart).
+
+"""
+
+# From Python Standard Library
+import os
+from json               import loads as jsonloads
+from json               import dumps as jsondumps
+from collections        import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from speedcuber.cube      import Cube
+from speedcuber.solutions import SolutionCache
+
+# Solvers that can be used, by name, as the Cube method they call
+METHODS = {'twophase':      'solve_twophase',
+           'optimal':       'solve_optimal',
+           'bidirectional': 'solve_bidirectional',
+           'cpu':           'solve_cpu_singlethread',
+           'dfs':           'solve_dfs',
+           'mem':           'solve_mem_singlethread'}
+# Lines handed to the workers at a time, per worker
+WINDOW_PER_WORKER = 8
+
+# The solution caches of this process, by file name and method
+_caches = dict()
+
+
+def solve_line(line, number, method='twophase', cache=None):
+    """ Solves the cube of one JSON line and returns its JSON result
+
+    cache is the file name of a solution cache, if any.
+
+    """
+
+    identifier = number
+    try:
+        dictionary = jsonloads(line)
+        identifier = dictionary.get("id", number)
+        cube = Cube()
+        cube.loads(line)
+        if cache is None:
+            moves, _ = getattr(cube, METHODS[method])()
+        else:
+            if (cache, method) not in _caches:
+                _caches[(cache, method)] = SolutionCache(filename=cache,
+                                                         method=method)
+            moves, _ = _caches[(cache, method)].solve(cube)
+        result = {"id": identifier, "moves": moves, "length": len(moves)}
+    except(ValueError, KeyError, TypeError, AttributeError,
+           MemoryError) as error:
+        result = {"id": identifier,
+                  "error": "%s: %s" % (type(error).__name__, error)}
+    return jsondumps(result)
+
+def solve_stream(lines, workers=None, ordered=True, method='twophase',
+                 window=None, cache=None):
+    """ Solves every cube of an iterable of JSON lines
+
+    Yields the JSON result of every line (without its line break), in
+    the order of the lines if ordered, or else as soon as it is ready.
+    Blank lines are skipped (but still counted as lines).
+
+    workers is the number of processes (by default one per CPU), and
+    window the number of lines they're given at a time (by default
+    WINDOW_PER_WORKER per worker). cache is the file name of a solution
+    cache shared by the workers, if any.
+
+    """
+
+    if method not in METHODS:
+        raise(ValueError("unknown method %r" % (method,)))
+    workers = workers or os.cpu_count()
+    window  = window or workers * WINDOW_PER_WORKER
+    lines   = ((number, line) for number, line in enumerate(lines)
+               if line.strip())
+    executor = ProcessPoolExecutor(max_workers=workers)
+    pending  = deque()
+
+    def ready():
+        if ordered:
+            return [pending.popleft()]
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.remove(future)
+        return done
+
+    try:
+        for number, line in lines:
+            pending.append(executor.submit(solve_line, line, number, method,
+                                           cache))
+            if len(pending) >= window:
+                for future in ready():
+                    yield future.result()
+        while pending:
+            for future in ready():
+                yield future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,158 @@
+""" Checkpoints of long searches, to resume them after a restart
+
+solve_cpu_singlethread() and solve_mem_singlethread() can take hours at
+the deeper lengths. Given a checkpoint, they save their progress to it
+every interval seconds:
+  * the cube being solved, the solver and its options
+  * the depth and position reached: the next move list to try, or the
+    cubes of the current and next lengths and how many were extended
+  * the transposition table, for solve_mem_singlethread(), as 16 byte
+    keys and one byte depths
+
+The file (a numpy .npz archive) is written aside and renamed, so a
+search killed while saving leaves the previous checkpoint. A solver
+given a checkpoint file of the same cube continues from it instead of
+starting over, and removes it once the cube is solved:
+
+    moves, _ = cube.solve_mem_singlethread(checkpoint='search.npz')
+    # killed, then on another machine:
+    moves, _ = resume('search.npz')
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+import os
+import json
+from time import monotonic
+
+FORMAT_VERSION      = 1
+# Seconds between two saves unless told otherwise
+CHECKPOINT_INTERVAL = 300
+# The Cube method of every solver that can be checkpointed
+SOLVERS = {'cpu': 'solve_cpu_singlethread',
+           'mem': 'solve_mem_singlethread'}
+
+
+class Checkpoint:
+    """ The checkpoint file of a search
+
+    interval is the number of seconds between two saves. saves counts
+    the checkpoints written.
+
+    """
+
+    def __init__(self, filename, interval=CHECKPOINT_INTERVAL):
+        self.filename = filename
+        self.interval = interval
+        self.saves    = 0
+        self._last    = monotonic()
+
+    def due(self):
+        """ True if interval seconds have passed since the last save """
+
+        return monotonic() - self._last >= self.interval
+
+    def save(self, solver, state, progress, **arrays):
+        """ Saves the progress of solver on a state
+
+        progress is a dictionary stored as JSON, arrays the arrays that
+        come with it.
+
+        """
+
+        meta = {'format':   FORMAT_VERSION,
+                'solver':   solver,
+                'state':    np.asarray(state).tolist(),
+                'progress': progress}
+        arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'),
+                                       dtype=np.uint8)
+        temporary = self.filename + '.%d.tmp' % os.getpid()
+        file_handle = open(temporary, 'wb')
+        try:
+            np.savez(file_handle, **arrays)
+            file_handle.flush()
+            os.fsync(file_handle.fileno())
+        finally:
+            file_handle.close()
+        os.replace(temporary, self.filename)
+        self.saves += 1
+        self._last  = monotonic()
+
+    def read(self):
+        """ The metadata and arrays of the checkpoint, None if there's none
+
+        ValueError is raised if the file isn't a checkpoint.
+
+        """
+
+        if not os.path.exists(self.filename):
+            return None
+        try:
+            archive = np.load(self.filename, allow_pickle=False)
+            arrays  = dict((name, archive[name]) for name in archive.files)
+            archive.close()
+            meta = json.loads(arrays.pop('meta').tobytes().decode('utf-8'))
+        except(OSError, KeyError, ValueError):
+            raise(ValueError("%s is not a checkpoint" % self.filename))
+        if meta.get('format') != FORMAT_VERSION:
+            raise(ValueError("%s is not a checkpoint of this version"
+                             % self.filename))
+        return meta, arrays
+
+    def load(self, solver, state):
+        """ The progress and arrays saved by solver on a state, if any
+
+        Returns None if there is no checkpoint yet. ValueError is raised
+        if it is the checkpoint of another solver or cube.
+
+        """
+
+        saved = self.read()
+        if saved is None:
+            return None
+        meta, arrays = saved
+        if meta['solver'] != solver or \
+           meta['state'] != np.asarray(state).tolist():
+            raise(ValueError("%s is a checkpoint of another search"
+                             % self.filename))
+        return meta['progress'], arrays
+
+    def clear(self):
+        """ Removes the checkpoint, once the search is over """
+
+        if os.path.exists(self.filename):
+            os.remove(self.filename)
+
+
+def as_checkpoint(checkpoint):
+    """ A Checkpoint from a file name (or a Checkpoint, or None) """
+
+    if checkpoint is None or isinstance(checkpoint, Checkpoint):
+        return checkpoint
+    return Checkpoint(checkpoint)
+
+def resume(checkpoint, stats=None):
+    """ Continues the search saved in a checkpoint
+
+    Returns what the solver returns, as if it had never stopped.
+
+    """
+
+    # imported here as speedcuber.cube depends on this module
+    from speedcuber.cube import Cube
+    checkpoint = as_checkpoint(checkpoint)
+    saved = checkpoint.read()
+    if saved is None:
+        raise(ValueError("%s has no checkpoint" % checkpoint.filename))
+    meta, _ = saved
+    if meta['solver'] not in SOLVERS:
+        raise(ValueError("unknown solver %r" % (meta['solver'],)))
+    cube = Cube()
+    cube.state = np.array(meta['state'], dtype=np.uint8)
+    options = meta['progress'].get('options', dict())
+    return getattr(cube, SOLVERS[meta['solver']])(stats=stats,
+                                                  checkpoint=checkpoint,
+                                                  **options)
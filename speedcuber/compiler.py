@@ -0,0 +1,90 @@
+""" Move sequences compiled into a single permutation
+
+A move is a permutation of the 54 stickers, applied as a gather (see
+MOVES), and so is any sequence of moves: compile_moves() composes the
+permutations of a sequence once, and applying it to a cube, or to an
+(N, 54) array of them, is then a single gather however long the
+sequence is.
+
+Sequences are simplified first (see simplify()), and compiled ones are
+kept by sequence, so the same algorithm or scramble applied again and
+again is only compiled once:
+
+    cube.MOTIONS('RUruRUruRUru')
+    states = apply_sequence(states, 'FRUruf')
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+from functools import lru_cache
+
+from speedcuber.cube import MOVES, OPPOSITE
+
+# Compiled sequences kept
+COMPILED_CACHE = 4096
+_IDENTITY = np.arange(54)
+_IDENTITY.flags.writeable = False
+
+
+def simplify(moves):
+    """ Shortest equivalent of a sequence of moves, as a string
+
+    Consecutive turns of a side are merged (a half turn is written as two
+    motions, three motions as one the other way) or cancelled, also
+    across turns of the opposite side, which commute with them: 'FBf'
+    becomes 'B', 'RRR' becomes 'r'.
+
+    """
+
+    turns = []                          # [side, clockwise quarter turns]
+    for move in moves:
+        if move not in MOVES:
+            raise(ValueError("unknown move %r" % (move,)))
+        side = move.upper()
+        quarters = 1 if move == side else 3
+        if turns and turns[-1][0] == side:
+            index = -1
+        elif len(turns) > 1 and turns[-1][0] == OPPOSITE[side] and \
+             turns[-2][0] == side:
+            index = -2
+        else:
+            turns.append([side, quarters])
+            continue
+        turns[index][1] = (turns[index][1] + quarters) % 4
+        if turns[index][1] == 0:
+            del turns[index]
+    return ''.join({1: side, 2: side * 2, 3: side.lower()}[quarters]
+                   for side, quarters in turns)
+
+@lru_cache(maxsize=COMPILED_CACHE)
+def _compile(moves):
+    permutation = _IDENTITY
+    for move in simplify(moves):
+        permutation = permutation[MOVES[move]]
+    permutation.flags.writeable = False
+    return permutation
+
+def compile_moves(moves):
+    """ The permutation of the 54 stickers applying a sequence of moves
+
+    Like the permutations of MOVES, it is applied as a gather:
+    state[compile_moves('FRu')]. Read-only, and kept for the next time
+    the same sequence is compiled.
+
+    """
+
+    if not isinstance(moves, str):
+        moves = ''.join(moves)
+    return _compile(moves)
+
+def apply_sequence(states, moves):
+    """ Applies a sequence of moves to a state or an (N, 54) array of them
+
+    Returns the new state (or states), computed with a single gather.
+
+    """
+
+    return np.asarray(states)[..., compile_moves(moves)]
@@ -3,16 +3,117 @@ import numpy as np
 
 # From Python Standard Library
 from random import SystemRandom as sysrand
-from copy   import deepcopy
+from random import Random
 from json   import loads as jsonloads
-from json   import dump  as jsondump
+from json   import dumps as jsondumps
+
+from speedcuber.transposition import TranspositionTable, state_key
+from speedcuber.stats         import SearchStats
+from speedcuber.checkpoint    import as_checkpoint
+
+# The sides in the order they are stored in Cube.state, which is also the
+# order they appear in Cube.str() (up, then the middle row left to right,
+# then down). Each side takes 9 consecutive stickers, row by row.
+FACES   = ('up', 'left', 'front', 'right', 'back', 'down')
+# The colour of each side of a solved cube. A sticker is stored as the
+# index of its colour in this string.
+COLOURS = 'WRBOGY'
+
+# Each clockwise move as the strips of stickers it moves around the turned
+# face. Every strip reads as: destination side and slice, source side and
+# slice, and whether the source strip is reversed on its way.
+_CLOCKWISE = {
+    'F': ('front', (('left',  np.s_[:, 2], 'down',  np.s_[0],    False),
+                    ('down',  np.s_[0],    'right', np.s_[:, 0], True),
+                    ('right', np.s_[:, 0], 'up',    np.s_[2],    False),
+                    ('up',    np.s_[2],    'left',  np.s_[:, 2], True))),
+    'B': ('back',  (('up',    np.s_[0],    'right', np.s_[:, 2], False),
+                    ('right', np.s_[:, 2], 'down',  np.s_[2],    True),
+                    ('down',  np.s_[2],    'left',  np.s_[:, 0], False),
+                    ('left',  np.s_[:, 0], 'up',    np.s_[0],    True))),
+    'R': ('right', (('front', np.s_[:, 2], 'down',  np.s_[:, 2], False),
+                    ('down',  np.s_[:, 2], 'back',  np.s_[:, 0], True),
+                    ('back',  np.s_[:, 0], 'up',    np.s_[:, 2], True),
+                    ('up',    np.s_[:, 2], 'front', np.s_[:, 2], False))),
+    'L': ('left',  (('front', np.s_[:, 0], 'up',    np.s_[:, 0], False),
+                    ('up',    np.s_[:, 0], 'back',  np.s_[:, 2], True),
+                    ('back',  np.s_[:, 2], 'down',  np.s_[:, 0], True),
+                    ('down',  np.s_[:, 0], 'front', np.s_[:, 0], False))),
+    'U': ('up',    (('front', np.s_[0],    'right', np.s_[0],    False),
+                    ('right', np.s_[0],    'back',  np.s_[0],    False),
+                    ('back',  np.s_[0],    'left',  np.s_[0],    False),
+                    ('left',  np.s_[0],    'front', np.s_[0],    False))),
+    'D': ('down',  (('front', np.s_[2],    'left',  np.s_[2],    False),
+                    ('left',  np.s_[2],    'back',  np.s_[2],    False),
+                    ('back',  np.s_[2],    'right', np.s_[2],    False),
+                    ('right', np.s_[2],    'front', np.s_[2],    False))),
+}
+
+def _build_moves():
+    """ Turns _CLOCKWISE into a permutation of the 54 stickers per move
+
+    A permutation p applies a move as a single gather: state[p].
+    Counter-clockwise moves are the inverse permutations of the
+    clockwise ones.
+
+    """
+
+    sides = dict(zip(FACES, np.arange(54).reshape(6, 3, 3)))
+    moves = dict()
+    for move, (face, strips) in _CLOCKWISE.items():
+        permutation = np.arange(54)
+        destination = dict(zip(FACES, permutation.reshape(6, 3, 3)))
+        for dst_side, dst_slice, src_side, src_slice, reverse in strips:
+            source = sides[src_side][src_slice]
+            if reverse == True:
+                source = source[::-1]
+            destination[dst_side][dst_slice] = source
+        # face rotation
+        destination[face][:] = np.rot90(sides[face], -1)
+        moves[move]         = permutation
+        moves[move.lower()] = np.argsort(permutation)
+    for permutation in moves.values():
+        permutation.flags.writeable = False
+    return moves
+
+# Precomputed permutation of the stickers for every move
+MOVES = _build_moves()
+
+# The side opposite to every side, by the letter of its clockwise move.
+# Moves of opposite sides commute.
+OPPOSITE = {'F': 'B', 'B': 'F', 'R': 'L', 'L': 'R', 'U': 'D', 'D': 'U'}
+
+class InvalidCubeError(ValueError):
+    """ The Cube can't be solved with legal motions """
+
+
+def _side_property(name):
+    """ Exposes one side of Cube.state as a 3x3 matrix of colour letters
+
+    Reading the side converts it from the flat state, so the returned
+    matrix is a copy: assign a whole side to modify the Cube.
+
+    """
+
+    start = FACES.index(name) * 9
+
+    def getter(self):
+        return np.array(list(COLOURS))[self.state[start:start+9]].reshape(3, 3)
+
+    def setter(self, side):
+        self.state[start:start+9] = [COLOURS.index(colour)
+                                     for colour in np.ravel(side)]
+
+    return property(getter, setter, doc="The " + name + " side of the Cube")
 
 class Cube:
     """ A simple 3x3x3 Cube solver
 
-    This class stores a cube in memory with each side as a matrix of str.
-    Each element in this "list of lists" represents a colour.
-    Each side is written as if looking towars that face of the cube.
+    This class stores a cube in memory as a flat array of 54 stickers
+    (Cube.state, numpy uint8), side after side in the order of FACES.
+    Each element represents a colour.
+    Each side is written as if looking towars that face of the cube, and
+    can also be read or written as a matrix of str (eg: self.front).
 
     Those sides are:   front, back, up, down, left and right.
     Those colours are: 'B' for Blue
@@ -36,41 +137,43 @@ class Cube:
                        'R' for Right clockwise
                        'r' for Right countrer-clockwise
     As a general rule, clockwise motions are capitalised.
+    Every motion is a precomputed permutation of the stickers (MOVES), so
+    moving the cube is a single gather and copying it a 54 bytes copy.
 
     Some methods are duplicated, such as self.motion() and self.shuffle()
     The capitalised version (eg: self.MOTION()) overwrites the object
     itself while non-capitalised methods don't modify the object and
     instead return a modified copy.
 
-    It currently lacks a way to check the cube (especially if it is
-    loaded from a json textfile) has a possible solution.
+    Every solver first checks the cube (especially if it is loaded from
+    a json textfile) has a possible solution, see self.validate().
 
     """
 
+    rotation_types = \
+          ['F', 'f', 'R', 'r', 'L', 'l', 'U', 'u', 'D', 'd', 'B', 'b']
+
+    front = _side_property('front')
+    back  = _side_property('back')
+    up    = _side_property('up')
+    down  = _side_property('down')
+    left  = _side_property('left')
+    right = _side_property('right')
+
     def __init__(self):
-        """ Initialse a solved cube and define the rotation array """
-
-        self.front = np.array([['B', 'B', 'B'],
-                               ['B', 'B', 'B'],
-                               ['B', 'B', 'B']])
-        self.up    = np.array([['W', 'W', 'W'],
-                               ['W', 'W', 'W'],
-                               ['W', 'W', 'W']])
-        self.down  = np.array([['Y', 'Y', 'Y'],
-                               ['Y', 'Y', 'Y'],
-                               ['Y', 'Y', 'Y']])
-        self.left  = np.array([['R', 'R', 'R'],
-                               ['R', 'R', 'R'],
-                               ['R', 'R', 'R']])
-        self.right = np.array([['O', 'O', 'O'],
-                               ['O', 'O', 'O'],
-                               ['O', 'O', 'O']])
-        self.back  = np.array([['G', 'G', 'G'],
-                                ['G', 'G', 'G'],
-                                ['G', 'G', 'G']])
-        self.rotation_types = \
-              ['F', 'f', 'R', 'r', 'L', 'l', 'U', 'u', 'D', 'd', 'B', 'b']
+        """ Initialse a solved cube """
+
+        self.state = np.repeat(np.arange(6, dtype=np.uint8), 9)
 
+    def copy(self):
+        """ Returns a copy of the Cube (only its 54 stickers are copied) """
+
+        cube_copy = Cube.__new__(Cube)
+        cube_copy.state = self.state.copy()
+        return cube_copy
+
+    def __deepcopy__(self, memo):
+        return self.copy()
 
     def str(self):
         """ Write the cube into a pretty string """
@@ -88,34 +191,19 @@ class Cube:
         # print("    xxx        ")
         # print("    xxx        ")
 
-        cube_str = ""
-
-        cube_str += "    "+self.up[0][0]+self.up[0][1]+self.up[0][2]+"        "+"\n"
-        cube_str += "    "+self.up[1][0]+self.up[1][1]+self.up[1][2]+"        "+"\n"
-        cube_str += "    "+self.up[2][0]+self.up[2][1]+self.up[2][2]+"        "+"\n"
+        rows = [''.join(COLOURS[colour] for colour in self.state[i:i+3])
+                for i in range(0, 54, 3)]
+        up, left, front, right, back, down = \
+            [rows[3*i:3*i+3] for i in range(6)]
 
+        cube_str = ""
+        for row in up:
+            cube_str += "    "+row+"        "+"\n"
         cube_str += "               "+"\n"
-
-        cube_str +=  self.left[0][0]+ self.left[0][1]+ self.left[0][2]+" "
-        cube_str += self.front[0][0]+self.front[0][1]+self.front[0][2]+" "
-        cube_str += self.right[0][0]+self.right[0][1]+self.right[0][2]+" "
-        cube_str +=  self.back[0][0]+ self.back[0][1]+ self.back[0][2]+"\n"
-
-        cube_str +=  self.left[1][0]+ self.left[1][1]+ self.left[1][2]+" "
-        cube_str += self.front[1][0]+self.front[1][1]+self.front[1][2]+" "
-        cube_str += self.right[1][0]+self.right[1][1]+self.right[1][2]+" "
-        cube_str +=  self.back[1][0]+ self.back[1][1]+ self.back[1][2]+"\n"
-
-        cube_str +=  self.left[2][0]+ self.left[2][1]+ self.left[2][2]+" "
-        cube_str += self.front[2][0]+self.front[2][1]+self.front[2][2]+" "
-        cube_str += self.right[2][0]+self.right[2][1]+self.right[2][2]+" "
-        cube_str +=  self.back[2][0]+ self.back[2][1]+ self.back[2][2]+"\n"
-
+        for i in range(3):
+            cube_str += left[i]+" "+front[i]+" "+right[i]+" "+back[i]+"\n"
         cube_str += "               "+"\n"
-
-        cube_str += "    "+self.down[0][0]+self.down[0][1]+self.down[0][2]+"        \n"
-        cube_str += "    "+self.down[1][0]+self.down[1][1]+self.down[1][2]+"        \n"
-        cube_str += "    "+self.down[2][0]+self.down[2][1]+self.down[2][2]+"        "
+        cube_str += "\n".join("    "+row+"        " for row in down)
 
         return cube_str
 
@@ -127,31 +215,29 @@ class Cube:
 
         """
 
-        solved = False
-        solved_array = []
-        solved_array.append(self.is_side_solved(self.front))
-        solved_array.append(self.is_side_solved(self.back))
-        solved_array.append(self.is_side_solved(self.left))
-        solved_array.append(self.is_side_solved(self.right))
-        solved_array.append(self.is_side_solved(self.up))
-        solved_array.append(self.is_side_solved(self.down))
-        if solved_array.count(True) == 6:
-            solved = True
-        return solved
+        sides = self.state.reshape(6, 9)
+        return bool((sides == sides[:, 4:5]).all())
 
     def is_side_solved(self, side):
         """ Check if a single side of the Cube is solved """
 
-        solved = True
-        core = side[1][1]
-        for i in range(3):
-            for j in range(3):
-                if not core == side[i][j]:
-                    solved = False
-                    break
-            if solved == False:
-                break
-        return solved
+        side = np.asarray(side)
+        return bool((side == side[1][1]).all())
+
+    def validate(self):
+        """ Checks the Cube can be solved
+
+        It raises InvalidCubeError (a ValueError) telling why it can't:
+        wrong colour counts, a corner or edge that doesn't exist or appears
+        twice, a twisted corner, a flipped edge or two swapped pieces (see
+        speedcuber.cubie.validate()). An invalid cube would make the
+        solvers search forever.
+
+        """
+
+        # imported here as speedcuber.cubie depends on this module
+        from speedcuber.cubie import validate
+        validate(self.state)
 
     def motion(self, motion_str):
         """ Non-destructive version of MOTION
@@ -161,8 +247,8 @@ class Cube:
 
         """
 
-        cube_copy = deepcopy(self)
-        return copy.MOTION(motion_str)
+        cube_copy = self.copy()
+        return cube_copy.MOTION(motion_str)
 
     def MOTION(self, motion_str):
         """ Apply one move to the Cube
@@ -183,189 +269,73 @@ class Cube:
 
         """
 
-        # Front clockwise
-        if motion_str == 'F':
-            # sides movement
-            buffer_array    = deepcopy(self.left[:,2])
-            self.left[:,2]  = self.down[0]
-            self.down[0]    = np_reversed(self.right[:,0])
-            self.right[:,0] = self.up[2]
-            self.up[2]     = np_reversed(buffer_array)
-            # face rotation
-            self.__FACE_ROTATE_CLOCK(self.front)
-
-        # Front counter-clockwise
-        elif motion_str == 'f':
-            # sides movement
-            buffer_array    = deepcopy(self.left[:,2])
-            self.left[:,2]  = np_reversed(self.up[2])
-            self.up[2]     = self.right[:,0]
-            self.right[:,0] = np_reversed(self.down[0])
-            self.down[0]    = buffer_array
-            # face rotation
-            self.__FACE_ROTATE_COUNTER(self.front)
-
-        # Back clockwise
-        elif motion_str == 'B':
-            # sides movement
-            buffer_array    = deepcopy(self.up[0])
-            self.up[0]     = self.right[:,2]
-            self.right[:,2] = np_reversed(self.down[2])
-            self.down[2]    = self.left[:,0]
-            self.left[:,0]  = np_reversed(buffer_array)
-            # face rotation
-            self.__FACE_ROTATE_CLOCK(self.back)
-        # Back counter-clockwise
-        elif motion_str == 'b':
-            # sides movement
-            buffer_array    = deepcopy(self.up[0])
-            self.up[0]     = np_reversed(self.left[:,0])
-            self.left[:,0]  = self.down[2]
-            self.down[2]    = np_reversed(self.right[:,2])
-            self.right[:,2] = buffer_array
-            # face rotation
-            self.__FACE_ROTATE_COUNTER(self.back)
-
-        # Right clockwise
-        elif motion_str == 'R':
-            # sides movement
-            buffer_column   = deepcopy(self.front[:,2])
-            self.front[:,2] = self.down[:,2]
-            self.down[:,2]  = np_reversed(self.back[:,0])
-            self.back[:,0]  = np_reversed(self.up[:,2])
-            self.up[:,2]    = buffer_column
-            # face rotation
-            self.__FACE_ROTATE_CLOCK(self.right)
-        # Right counter-clockwise
-        elif motion_str == 'r':
-            # sides movement
-            buffer_column   = deepcopy(self.front[:,2])
-            self.front[:,2] = self.up[:,2]
-            self.up[:,2]    = np_reversed(self.back[:,0])
-            self.back[:,0]  = np_reversed(self.down[:,2])
-            self.down[:,2]  = buffer_column
-            # face rotation
-            self.__FACE_ROTATE_COUNTER(self.right)
-
-        # Left clockwise
-        elif motion_str == 'L':
-            # sides movement
-            buffer_column   = deepcopy(self.front[:,0])
-            self.front[:,0] = self.up[:,0]
-            self.up[:,0]    = np_reversed(self.back[:,2])
-            self.back[:,2]  = np_reversed(self.down[:,0])
-            self.down[:,0]  = buffer_column
-            # face rotation
-            self.__FACE_ROTATE_CLOCK(self.left)
-        # Left counter-clockwise
-        elif motion_str == 'l':
-            # sides movement
-            buffer_column    = deepcopy(self.front[:,0])
-            self.front[:,0]  = self.down[:,0]
-            self.down[:,0] = np_reversed(self.back[:,2])
-            self.back[:,2]   = np_reversed(self.up[:,0])
-            self.up[:,0]    = buffer_column
-            # face rotation
-            self.__FACE_ROTATE_COUNTER(self.left)
-
-        # Up clockwise
-        elif motion_str == 'U':
-            # sides movement
-            buffer_row    = deepcopy(self.front[0])
-            self.front[0] = self.right[0]
-            self.right[0] = self.back[0]
-            self.back[0]  = self.left[0]
-            self.left[0]  = buffer_row
-            # face rotation
-            self.__FACE_ROTATE_CLOCK(self.up)
-        # Up counter-clockwise
-        elif motion_str == 'u':
-            # sides movement
-            buffer_row    = deepcopy(self.front[0])
-            self.front[0] = self.left[0]
-            self.left[0]  = self.back[0]
-            self.back[0]  = self.right[0]
-            self.right[0] = buffer_row
-            # face rotation
-            self.__FACE_ROTATE_COUNTER(self.up)
-
-        # Down clockwise
-        elif motion_str == 'D':
-            # sides movement
-            buffer_row    = deepcopy(self.front[2])
-            self.front[2] = self.left[2]
-            self.left[2]  = self.back[2]
-            self.back[2]  = self.right[2]
-            self.right[2] = buffer_row
-            # face rotation
-            self.__FACE_ROTATE_CLOCK(self.down)
-        # Down counter-clockwise
-        elif motion_str == 'd':
-            # sides movement
-            buffer_row    = deepcopy(self.front[2])
-            self.front[2] = self.right[2]
-            self.right[2] = self.back[2]
-            self.back[2]  = self.left[2]
-            self.left[2]  = buffer_row
-            # face rotation
-            self.__FACE_ROTATE_COUNTER(self.down)
-
-        else:
+        try:
+            self.state = self.state[MOVES[motion_str]]
+        except(KeyError):
             raise(ValueError)
 
         return self
 
-    def __FACE_ROTATE_CLOCK(self, matrix):
-        buffer_int   = matrix[0][0]
-        matrix[0][0] = matrix[2][0]
-        matrix[2][0] = matrix[2][2]
-        matrix[2][2] = matrix[0][2]
-        matrix[0][2] = buffer_int
+    def motions(self, moves):
+        """ Non-destructive version of MOTIONS
+
+        It won't modify the cube but return a copy of it with those moves
+        applied to it.
+
+        """
 
-        buffer_int   = matrix[0][1]
-        matrix[0][1] = matrix[1][0]
-        matrix[1][0] = matrix[2][1]
-        matrix[2][1] = matrix[1][2]
-        matrix[1][2] = buffer_int
+        cube_copy = self.copy()
+        return cube_copy.MOTIONS(moves)
 
-        return matrix
+    def MOTIONS(self, moves):
+        """ Apply a sequence of moves to the Cube
 
-    def __FACE_ROTATE_COUNTER(self, matrix):
-        buffer_int = matrix[0][0]
-        matrix[0][0] = matrix[0][2]
-        matrix[0][2] = matrix[2][2]
-        matrix[2][2] = matrix[2][0]
-        matrix[2][0] = buffer_int
+        The moves (a string or list of the motions of self.MOTION()) are
+        compiled into a single permutation of the stickers, applied in one
+        go, and kept to be applied again (see speedcuber.compiler).
 
-        buffer_int   = matrix[0][1]
-        matrix[0][1] = matrix[1][2]
-        matrix[1][2] = matrix[2][1]
-        matrix[2][1] = matrix[1][0]
-        matrix[1][0] = buffer_int
+        This motion will modify the cube itself.
 
-        return matrix
+        """
 
-    def shuffle_moves(self, n):
-        """ Outputs a list of n random moves """
+        # imported here as speedcuber.compiler depends on this module
+        from speedcuber.compiler import compile_moves
+        self.state = self.state[compile_moves(moves)]
+        return self
 
-        shuffles = []
+    def shuffle_moves(self, n, seed=None):
+        """ Outputs a list of n random moves
+
+        The moves are a canonical sequence (see canonical_gen()), so none
+        undoes or repeats the previous ones. They are drawn from the
+        system's random source, or from a generator seeded with seed to
+        get the same moves again. See speedcuber.scramble to generate
+        many scrambles at once.
+
+        """
+
+        rng        = sysrand() if seed is None else Random(seed)
+        successors = canonical_successors(self.rotation_types)
+        shuffles   = []
         for i in range(n):
-            shuffles.append(self.rotation_types[sysrand().randrange(0,11)])
+            shuffles.append(rng.choice(
+                successors[(''.join(shuffles[-2:-1]),
+                            ''.join(shuffles[-1:]))]))
         return shuffles
 
-    def SHUFFLE(self, n):
+    def SHUFFLE(self, n, seed=None):
         """ Applies n random moves to the Cube
 
         It will modify the Cube and return the list of applied moves.
 
         """
 
-        shuffles = self.shuffle_moves(n)
+        shuffles = self.shuffle_moves(n, seed)
         for move in shuffles:
             self = self.MOTION(move)
         return shuffles
 
-    def shuffle(self, n):
+    def shuffle(self, n, seed=None):
         """ Non-destructive version of SHUFFLE
 
         It won't modify the cube but return a shuffled copy of it.
@@ -373,18 +343,19 @@ class Cube:
 
         """
 
-        cube_copy = deepcopy(self)
-        return cube_copy.SHUFFLE(n), shuffles
+        cube_copy = self.copy()
+        shuffles  = cube_copy.SHUFFLE(n, seed)
+        return cube_copy, shuffles
 
-    def solve_cpu_singlethread(self):
+    def solve_cpu_singlethread(self, stats=None, checkpoint=None):
         """ Solves the Cube and outputs the move list
 
         It tries all posible motions of increasing movement until the
         Cube is solved.
 
-        It doesn't check if it is a valid cube (that it hasn't beed
-        twisted and has no solution with legal motions - without moving
-        stickers arround or removing and turning cubies.
+        It first checks it is a valid cube (that it hasn't beed twisted
+        and has a solution with legal motions - without moving stickers
+        arround or removing and turning cubies), see self.validate().
 
         ----------------------------------------------------------------
 
@@ -394,100 +365,320 @@ class Cube:
         any other move that start with 'FlT').
         It is therefore CPU intensive but uses very little memory.
 
+        Only canonical sequences are tried (see canonical_gen()), so no
+        motion undoing or repeating the previous ones is wasted.
+
         It could be optimised CPU-wise by separating the execution of
         each different list of motions and checking if the resulting
-        cube is solved on independent threads.
+        cube is solved on independent threads, which is what
+        solve_parallel() does with processes.
+
+        solve_dfs() walks the same sequences in the same order on a single
+        state instead, without copying or replaying anything.
+
+        Every solve method fills in stats, a speedcuber.stats.SearchStats,
+        if one is given (here a node is a list of moves tried).
+
+        checkpoint, a file name or a speedcuber.checkpoint.Checkpoint, is
+        where the next move list to try is saved every few minutes. If it
+        holds the checkpoint of this cube already, the search continues
+        from it, and it is removed once the cube is solved.
 
         """
 
-        attempts = 1                                   # DEBUG
-        moves = self.rotation_types[0]
-        while True:
+        self.validate()
+        stats      = stats if stats is not None else SearchStats()
+        checkpoint = as_checkpoint(checkpoint)
+        saved      = None
+        if checkpoint is not None:
+            saved = checkpoint.load('cpu', self.state)
+        start    = None if saved is None else saved[0]['next']
+        attempts = 0 if saved is None else saved[0]['attempts']   # DEBUG
+        length   = None
+        tried    = 0
+        for moves in canonical_gen(self.rotation_types, start=start):
+            if checkpoint is not None and checkpoint.due():
+                checkpoint.save('cpu', self.state, {'next': moves,
+                                                    'attempts': attempts})
+            attempts += 1                               #DEBUG
+            if len(moves) != length:
+                # every shorter move list has been extended
+                stats.expand(tried)
+                stats.enter_depth(len(moves))
+                length = len(moves)
+                tried  = 0
+            tried += 1
+            stats.generate()
             # check those moves solve the cube
-            cube_copy = deepcopy(self)
+            cube_copy = self.copy()
             for move in moves:
                 cube_copy = cube_copy.MOTION(move)
             if cube_copy.is_solved() == True:
                 break
-            attempts += 1                               #DEBUG
-
-            # Update the moves
-            moves, __increased = key_gen(self.rotation_types, moves)
+        stats.finish()
+        if checkpoint is not None:
+            checkpoint.clear()
         return moves, attempts
 
-    def solve_mem_singlethread(self):
+    def solve_dfs(self, stats=None):
+        """ Solves the Cube and outputs the move list
+
+        It tries the same motions as solve_cpu_singlethread(), in the same
+        order, and returns the same moves and attempts, but depth first on
+        a single state: a motion is applied when going one motion deeper
+        and undone when coming back (see speedcuber.dfs). Nothing is
+        allocated per list of motions tried, which is several times faster
+        and uses as little memory.
+
+        """
+
+        self.validate()
+        # imported here as speedcuber.dfs depends on this module
+        from speedcuber.dfs import solve_dfs
+        return solve_dfs(self, stats)
+
+    def solve_mem_singlethread(self, max_entries=None, policy='depth',
+                               stats=None, checkpoint=None):
         """ Solves the Cube and outputs the move list
 
         It tries all posible motions of increasing movement until the
         Cube is solved.
 
-        It doesn't check if it is a valid cube (that it hasn't beed
-        twisted and has no solution with legal motions - without moving
-        stickers arround or removing and turning cubies.
+        It first checks it is a valid cube (that it hasn't beed twisted
+        and has a solution with legal motions - without moving stickers
+        arround or removing and turning cubies), see self.validate().
 
         ----------------------------------------------------------------
 
-        This version keeps a dictionary with all the previous moves and
-        the state of the cube after those moves.
+        This version keeps the cubes reached by the moves of the last
+        length tried (packed as 54 bytes of stickers and the bytes of
+        their moves), so each longer move list only applies its last
+        motion, and like solve_cpu_singlethread() it only tries canonical
+        sequences (see canonical_gen()).
+
+        Every state reached is also remembered in a transposition table
+        (see speedcuber.transposition): a move list reaching a state
+        already reached by another one (eg: 'FB' and 'BF', or 'FFRR' and
+        'RRFF') is not extended any further.
+
+        max_entries caps the number of states remembered, and the number
+        of cubes kept for the next length, so both can hold about twice
+        max_entries states at once: MemoryError is raised if the cube
+        isn't solved by any move list of a length and more cubes than
+        that need to be kept for the next one. policy chooses the states
+        forgotten first: 'depth' (the default) forgets the deepest ones
+        and keeps the shallow ones, which prune the most, while 'lru'
+        forgets the oldest ones, so a cap smaller than the states of one
+        length turns pruning off. A forgotten state may be extended
+        again, which only costs time: the solution found is still one of
+        the shortest, though not always the same moves as
+        solve_cpu_singlethread() returns.
+
+        Returns the moves and the number of move lists tried. stats counts
+        the states skipped as duplicates, and the table and cubes kept.
+
+        checkpoint works as for solve_cpu_singlethread(), saving the cubes
+        kept and the transposition table too (see speedcuber.checkpoint).
 
-        It is set to clean-up a bit (could be optimisied much further)
-        the dictionary by keeping only the cubes that correspond to the
-        list of moves that are of the last 2 length (eg: when the move
-        to check moves from 'bb' to 'FFF', all the single-move cube are
-        deleted.
+        """
 
-        This method could benefit from multithreading in the same way
-        as solve_cpu_singlethread(). Check it's documentation for
-        further information.
+        self.validate()
+        stats    = stats if stats is not None else SearchStats()
+        attempts = 1                                    # DEBUG
+        stats.generate()
+        if self.is_solved() == True:
+            stats.finish()
+            return '', attempts
+
+        table      = TranspositionTable(max_entries, policy)
+        successors = canonical_successors(self.rotation_types)
+        # a cube is solved when its stickers match its centres
+        solved     = state_key(np.repeat(self.state[4::9], 9))
+        checkpoint = as_checkpoint(checkpoint)
+        saved      = None
+        if checkpoint is not None:
+            saved = checkpoint.load('mem', self.state)
+        # the cubes of the length tried, as an array of their moves (all
+        # as long) and an (N, 54) array of their states, and those of the
+        # next length, packed as they are reached
+        if saved is None:
+            table.store(state_key(self.state), 0)
+            cube_moves    = np.array([b''])
+            cube_states   = np.asarray(self.state, dtype=np.uint8)[None]
+            longer_moves  = bytearray()
+            longer_states = bytearray()
+            length        = 1
+            extended      = 0
+            overflow      = False
+        else:
+            progress, arrays = saved
+            table.restore(arrays['table_keys'], arrays['table_depths'])
+            cube_moves    = arrays['moves']
+            cube_states   = arrays['states']
+            longer_moves  = bytearray(arrays['longer_moves'].tobytes())
+            longer_states = bytearray(arrays['longer_states'].tobytes())
+            length        = progress['length']
+            extended      = progress['extended']
+            attempts      = progress['attempts']
+            overflow      = progress.get('overflow', False)
+        while True:
+            stats.enter_depth(length)
+            for position in range(extended, len(cube_states)):
+                if checkpoint is not None and checkpoint.due():
+                    table_keys, table_depths = table.arrays()
+                    checkpoint.save('mem', self.state,
+                                    {'length':   length,
+                                     'extended': position,
+                                     'attempts': attempts,
+                                     'overflow': overflow,
+                                     'options':  {'max_entries': max_entries,
+                                                  'policy':      policy}},
+                                    moves=cube_moves, states=cube_states,
+                                    longer_moves=np.frombuffer(
+                                        longer_moves, dtype=np.uint8),
+                                    longer_states=np.frombuffer(
+                                        longer_states, dtype=np.uint8),
+                                    table_keys=table_keys,
+                                    table_depths=table_depths)
+                truncated_moves = cube_moves[position].decode('ascii')
+                state           = cube_states[position]
+                allowed = successors[(truncated_moves[-2:-1],
+                                      truncated_moves[-1:])]
+                stats.expand(1, len(allowed))
+                for move in allowed:
+                    attempts += 1                       #DEBUG
+                    moves     = truncated_moves + move
+                    moved     = state[MOVES[move]]
+                    key       = state_key(moved)
+                    if key == solved:
+                        stats.finish()
+                        if checkpoint is not None:
+                            checkpoint.clear()
+                        return moves, attempts
+                    if table.lookup(key) is not None:
+                        # already reached by other moves, no shorter
+                        stats.duplicate()
+                        continue
+                    if max_entries is not None and \
+                       len(longer_states) >= max_entries * 54:
+                        # too many to keep, though a later move list of
+                        # this length may still solve it
+                        overflow = True
+                        continue
+                    table.store(key, length)
+                    longer_moves  += moves.encode('ascii')
+                    longer_states += moved.tobytes()
+            if overflow == True:
+                raise(MemoryError("more than %d cubes of %d moves to keep"
+                                  % (max_entries, length)))
+            stats.table_size(len(table) + len(longer_states) // 54)
+            # the cubes of shorter moves are no longer needed
+            cube_moves    = np.frombuffer(longer_moves, dtype='S%d' % length)
+            cube_states   = np.frombuffer(longer_states, dtype=np.uint8
+                                          ).reshape(-1, 54)
+            longer_moves  = bytearray()
+            longer_states = bytearray()
+            length       += 1
+            extended      = 0
+
+    def solve_bidirectional(self, max_states=None, stats=None):
+        """ Solves the Cube and outputs the move list
+
+        It grows the motions tried from both the Cube and a solved cube
+        until both reach the same state, then joins both halves (see
+        speedcuber.bidirectional). It finds the same length of solution
+        as the single thread solvers exploring about the square root of
+        the states.
+
+        max_states caps how many states are kept in memory: MemoryError
+        is raised if the solution is too deep for it.
 
         """
 
-        attempts       = 1                               # DEBUG
-        modified_cubes = dict()
-        moves          = self.rotation_types[0]
-        increased      = False
-        while True:
-            # check those moves solve the cube,
-            # but first get from the dictionary all the moves already done
-            truncated_moves = moves[:-1]
-            try:
-                # The first pass of single moves is done!
-                # Only the last motion needs to be applied
-                cube_copy = deepcopy(modified_cubes[truncated_moves])
-                cube_copy = cube_copy.MOTION(moves[-1])
-            except(KeyError):
-                # This is a move from the first pass
-                cube_copy = deepcopy(self)
-                for move in moves:
-                    cube_copy = cube_copy.MOTION(move)
-                pass
+        self.validate()
+        # imported here as speedcuber.bidirectional depends on this module
+        from speedcuber.bidirectional import solve_bidirectional
+        return solve_bidirectional(self, max_states, stats)
 
-            if cube_copy.is_solved() == True:
-                break
-            attempts += 1                               #DEBUG
+    def solve_optimal(self, directory=None, stats=None):
+        """ Solves the Cube and outputs the shortest move list
 
-            # adds the new copy to the dictionary
-            modified_cubes[moves] = deepcopy(cube_copy)
-
-            # clean up the dictionary
-            # not optimised, just deletes all the cubes that are 2 moves
-            # shorter than current length (not useful)
-            if increased == True:
-                length_to_delete = len(moves) - 2
-                if length_to_delete >= 1:
-                    moves_to_delete = ''
-                    for i in range(length_to_delete):
-                        moves_to_delete += self.rotation_types[0]
-                    while True:
-                        del modified_cubes[moves_to_delete]
-                        moves_to_delete, break_condition = key_gen(self.rotation_types, moves_to_delete)
-                        if break_condition == True:
-                            break
-
-            # Update the moves
-            moves, increased = key_gen(self.rotation_types, moves)
+        It is an IDA* search guided by pattern databases of the corners
+        and of two halves of the edges (see speedcuber.idastar), which
+        reaches solutions far deeper than the single thread solvers.
 
-        return moves, attempts
+        The databases are stored in directory (by default
+        speedcuber.tables.TABLES_DIRECTORY). The first call generates
+        them, which takes a few minutes.
+
+        """
+
+        self.validate()
+        # imported here as speedcuber.idastar depends on this module
+        from speedcuber.idastar import solve_optimal
+        return solve_optimal(self, directory, stats)
+
+    def solve_parallel(self, workers=None, prefix_length=2, stats=None):
+        """ Solves the Cube and outputs the move list
+
+        It is the search of solve_cpu_singlethread() split across a pool
+        of worker processes (see speedcuber.parallel): every depth is
+        divided by the first prefix_length moves of its sequences. It
+        returns the same moves as solve_cpu_singlethread().
+
+        workers is the number of processes, one per CPU by default.
+
+        """
+
+        self.validate()
+        # imported here as speedcuber.parallel depends on this module
+        from speedcuber.parallel import solve_parallel
+        return solve_parallel(self, workers, prefix_length, stats)
+
+    def solve_twophase(self, max_length=None, timeout=None, stats=None):
+        """ Solves the Cube quickly and outputs the move list
+
+        It uses Kociemba's two-phase algorithm (see speedcuber.twophase):
+        the solution is not the shortest but usually about 21 moves
+        (a half turn, written as two motions, counting as one), found in a
+        fraction of a second. Give max_length to keep searching for a
+        solution of at most that many moves, for at most timeout seconds.
+
+        Its tables take a few seconds to build on the first call.
+
+        """
+
+        self.validate()
+        # imported here as speedcuber.twophase depends on this module
+        from speedcuber.twophase import solve_twophase
+        return solve_twophase(self, max_length, timeout, stats)
+
+    def solve_anytime(self, timeout=None, max_nodes=None, stats=None):
+        """ Yields better and better move lists for the Cube
+
+        The first one is the move list of self.solve_twophase(), then
+        every shorter one found before timeout seconds have passed or
+        max_nodes nodes have been visited, each with the number of nodes
+        visited so far (see speedcuber.twophase.solve_anytime()). The
+        last one is the best one found within that budget.
+
+        """
+
+        self.validate()
+        # imported here as speedcuber.twophase depends on this module
+        from speedcuber.twophase import solve_anytime
+        return solve_anytime(self, timeout, max_nodes, stats)
+
+    def solve(self, stats=None):
+        """ Solves the Cube and outputs the move list
+
+        This is the default way to solve a cube: the two-phase algorithm
+        (see self.solve_twophase()), as finding a short solution quickly
+        matters more than finding the shortest one.
+
+        """
+
+        return self.solve_twophase(stats=stats)
 
     def load(self, filename):
         """ Loads a json file into a Cube object
@@ -497,14 +688,21 @@ class Cube:
         It is a JSON file containing a dictionary with an element for each
         side of the Cube.
 
-        The json modules loads normal python arrays which are then converted
-        to numpy arrays.
-
         """
 
         file_handle = open(filename, 'r')
-        dictionary = jsonloads(file_handle.read())
+        self.loads(file_handle.read())
         file_handle.close()
+
+    def loads(self, text):
+        """ Loads a Cube object from a json string (see self.load())
+
+        The json modules loads normal python arrays which are then converted
+        to the flat state of the Cube.
+
+        """
+
+        dictionary = jsonloads(text)
         self.front = np.array(dictionary["front"])
         self.back  = np.array(dictionary["back"])
         self.left  = np.array(dictionary["left"])
@@ -516,14 +714,22 @@ class Cube:
         """ Stores a Cube object in a json text file
 
         A dictionary with every side of the cube is written to a text
-        file formated in JSON.
+        file formated in JSON (see self.dumps()).
+
+        """
+
+        file_handle = open(filename, 'w')
+        file_handle.write(self.dumps())
+        file_handle.close()
+
+    def dumps(self):
+        """ The Cube object as a json string (see self.dump())
 
         The json module doesn't have support for numpy arrays so those are
         converted to normal python arrays first.
 
         """
 
-
         dictionary = dict()
         dictionary["front"] = [list(elem) for elem in self.front]
         dictionary["back"]  = [list(elem) for elem in self.back]
@@ -531,15 +737,12 @@ class Cube:
         dictionary["right"] = [list(elem) for elem in self.right]
         dictionary["up"]    = [list(elem) for elem in self.up]
         dictionary["down"]  = [list(elem) for elem in self.down]
-        file_handle = open(filename, 'r+')
-        jsondump(dictionary, file_handle)
-        file_handle.close()
-
+        return jsondumps(dictionary)
 
 def np_reversed(array):
     """ neversed() for numpy arrays """
 
-    return np.array(list(reversed(array)))
+    return np.array(array[::-1])
 
 def key_gen(alphabet, key):
     """ Word generator
@@ -568,3 +771,99 @@ def key_gen(alphabet, key):
                 break
     return new_key, increased_length
 
+
+def invert_moves(moves):
+    """ The sequence undoing the given sequence of moves """
+
+    return ''.join(reversed(moves)).swapcase()
+
+def canonical_successors(alphabet):
+    """ Allowed next moves of a canonical sequence
+
+    Returns a dictionary that, given the last two moves of a sequence
+    ('' when the sequence is shorter), has the tuple of moves that can
+    follow them, in alphabet order. A canonical sequence never has:
+      * a move directly followed by its inverse (eg: 'Ff')
+      * three identical moves in a row (eg: 'FFF' is 'f')
+      * two counter-clockwise identical moves (eg: 'ff' is 'FF')
+      * a move followed by a move of the opposite side that comes first
+        in the alphabet, as both commute (eg: 'BF' is 'FB')
+
+    """
+
+    sides = []
+    for letter in alphabet:
+        if letter.upper() not in sides:
+            sides.append(letter.upper())
+
+    def allowed(before_last, last, move):
+        if last == '':
+            return True
+        if move == last.swapcase():
+            return False
+        if move == last and (move == before_last or move.islower()):
+            return False
+        if OPPOSITE[move.upper()] == last.upper() and \
+           sides.index(move.upper()) < sides.index(last.upper()):
+            return False
+        return True
+
+    successors = dict()
+    for before_last in [''] + list(alphabet):
+        for last in [''] + list(alphabet):
+            successors[(before_last, last)] = \
+                tuple(move for move in alphabet
+                      if allowed(before_last, last, move))
+    return successors
+
+def canonical_gen(alphabet, length=None, start=None):
+    """ Canonical move sequence generator
+
+    Yields every canonical sequence (see canonical_successors()) of the
+    given length, in the same order key_gen() would reach them.
+    Without a length, it yields them by increasing length starting with
+    the empty sequence and never stops.
+
+    With start, a canonical sequence, it yields the same sequences from
+    that one on, to continue where a previous generator stopped.
+
+    Every prefix of a canonical sequence is canonical too, so the cubes
+    of the previous length can be reused to try the next one.
+    With 12 motions it tries about 9.37 times more sequences for every
+    extra motion instead of 12.
+
+    """
+
+    successors = canonical_successors(alphabet)
+
+    def extend(moves, before_last, last, remaining, start=''):
+        if remaining == 0:
+            yield moves
+            return
+        allowed = successors[(before_last, last)]
+        if start != '':
+            # skip the moves before those of start
+            if start[0] not in allowed:
+                raise(ValueError("%r is not a canonical sequence"
+                                 % (moves + start,)))
+            allowed = allowed[allowed.index(start[0]):]
+        for move in allowed:
+            rest = start[1:] if start != '' and move == start[0] else ''
+            for sequence in extend(moves+move, last, move, remaining-1,
+                                   rest):
+                yield sequence
+
+    start = start or ''
+    if length is not None:
+        if start != '' and len(start) != length:
+            raise(ValueError("start must be a sequence of %d moves"
+                             % length))
+        for sequence in extend('', '', '', length, start):
+            yield sequence
+        return
+    length = len(start)
+    while True:
+        for sequence in extend('', '', '', length, start):
+            yield sequence
+        start   = ''
+        length += 1
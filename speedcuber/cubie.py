@@ -0,0 +1,287 @@
+""" Cubie level representation of the Cube
+
+Instead of its 54 stickers, a cube can be described by where each of its
+8 corners and 12 edges is and how it is turned:
+  cp: the corner at each corner position (permutation of range(8))
+  co: the twist of the corner at each position (0, 1 or 2)
+  ep: the edge at each edge position (permutation of range(12))
+  eo: the flip of the edge at each position (0 or 1)
+
+Corners are URF, UFL, ULB, UBR, DFR, DLF, DBL, DRB and edges UR, UF, UL,
+UB, DR, DF, DL, DB, FR, FL, BL, BR. The orientation of a corner is which
+of its stickers (clockwise from the up or down one) shows the up or down
+colour, and an edge is flipped when its stickers are swapped.
+
+Most functions are vectorised: they take arrays with any number of
+leading dimensions, so whole coordinate tables are built at once.
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+from math import factorial
+
+from speedcuber.cube import Cube, MOVES, InvalidCubeError
+
+# Stickers of every corner position, clockwise from the up/down sticker
+CORNER_FACELETS = np.array([[ 8, 27, 20],   # URF
+                            [ 6, 18, 11],   # UFL
+                            [ 0,  9, 38],   # ULB
+                            [ 2, 36, 29],   # UBR
+                            [47, 26, 33],   # DFR
+                            [45, 17, 24],   # DLF
+                            [51, 44, 15],   # DBL
+                            [53, 35, 42]])  # DRB
+# Stickers of every edge position, the up/down or front/back one first
+EDGE_FACELETS   = np.array([[ 5, 28],   # UR
+                            [ 7, 19],   # UF
+                            [ 3, 10],   # UL
+                            [ 1, 37],   # UB
+                            [50, 34],   # DR
+                            [46, 25],   # DF
+                            [48, 16],   # DL
+                            [52, 43],   # DB
+                            [23, 30],   # FR
+                            [21, 14],   # FL
+                            [41, 12],   # BL
+                            [39, 32]])  # BR
+
+# The side (index in FACES) of every sticker of a solved corner or edge
+CORNER_SIDES = CORNER_FACELETS // 9
+EDGE_SIDES   = EDGE_FACELETS // 9
+
+SOLVED = (np.arange(8), np.zeros(8, dtype=np.intp),
+          np.arange(12), np.zeros(12, dtype=np.intp))
+
+
+# Every corner and edge by the sides of its stickers (as base 6 numbers,
+# clockwise from the up/down sticker for corners): the piece, and for
+# edges whether it is flipped. Combinations of sides that aren't a piece
+# are -1.
+_CORNER_DIGITS = np.array([36, 6, 1])
+_EDGE_DIGITS   = np.array([6, 1])
+_CORNER_CODES  = np.full(6 ** 3, -1, dtype=np.intp)
+_CORNER_CODES[CORNER_SIDES @ _CORNER_DIGITS]       = np.arange(8)
+_EDGE_CODES    = np.full(6 ** 2, -1, dtype=np.intp)
+_EDGE_CODES[EDGE_SIDES @ _EDGE_DIGITS]             = np.arange(12)
+_EDGE_CODES[EDGE_SIDES[:, ::-1] @ _EDGE_DIGITS]    = np.arange(12)
+_CORNER_TURNS  = np.arange(3)
+
+
+def from_state(state):
+    """ Converts the 54 stickers of a Cube into (cp, co, ep, eo)
+
+    Colours are matched against the centres, so any colour scheme works.
+    ValueError is raised when some corner or edge doesn't exist.
+
+    """
+
+    state  = np.asarray(state)
+    lookup = np.full(256, -1, dtype=np.intp)
+    lookup[state[4::9]] = np.arange(6)
+    sides  = lookup[state]
+    if (sides < 0).any():
+        raise(ValueError("a sticker doesn't match any centre"))
+
+    corners = sides[CORNER_FACELETS]
+    up_down = (corners == 0) | (corners == 5)
+    co      = np.argmax(up_down, axis=1)
+    corners = np.take_along_axis(corners, (_CORNER_TURNS + co[:, None]) % 3,
+                                 axis=1)
+    cp      = _CORNER_CODES[corners @ _CORNER_DIGITS]
+    missing = (cp < 0) | (up_down.sum(axis=1) != 1)
+    if missing.any():
+        corner = corners[np.argmax(missing)]
+        raise(ValueError("corner %s doesn't exist" % (tuple(corner.tolist()),)))
+
+    edges   = sides[EDGE_FACELETS]
+    ep      = _EDGE_CODES[edges @ _EDGE_DIGITS]
+    if (ep < 0).any():
+        edge = edges[np.argmax(ep < 0)]
+        raise(ValueError("edge %s doesn't exist" % (tuple(edge.tolist()),)))
+    eo      = (edges[:, 0] != EDGE_SIDES[ep, 0]).astype(np.intp)
+    return (cp, co, ep, eo)
+
+def _parity(perm):
+    """ Parity of a single permutation (a list), counting its cycles """
+
+    seen   = [False] * len(perm)
+    cycles = 0
+    for start in range(len(perm)):
+        if not seen[start]:
+            cycles += 1
+            position = start
+            while not seen[position]:
+                seen[position] = True
+                position = perm[position]
+    return (len(perm) - cycles) % 2
+
+def validate(state):
+    """ Checks that the 54 stickers of a Cube can be solved
+
+    A cube can be solved by legal motions when each colour has 9 stickers
+    and its own centre, every corner and edge exists exactly once, the
+    corner twists and edge flips add up to nothing, and corners and edges
+    are permuted with the same parity (a single swap of two pieces can't
+    be solved). Returns the cubies (see from_state()), or raises
+    InvalidCubeError telling what is wrong.
+
+    """
+
+    state  = np.asarray(state)
+    counts = np.bincount(state.ravel(), minlength=6)
+    if len(counts) > 6 or (counts != 9).any():
+        raise(InvalidCubeError("every colour needs 9 stickers, counts are %s"
+                               % (counts.tolist(),)))
+    if len(set(state[4::9].tolist())) != 6:
+        raise(InvalidCubeError("two centres have the same colour"))
+    try:
+        cp, co, ep, eo = from_state(state)
+    except(ValueError) as error:
+        raise(InvalidCubeError(str(error)))
+    if len(set(cp.tolist())) != 8:
+        raise(InvalidCubeError("a corner appears twice"))
+    if len(set(ep.tolist())) != 12:
+        raise(InvalidCubeError("an edge appears twice"))
+    if co.sum() % 3 != 0:
+        raise(InvalidCubeError("a corner is twisted"))
+    if eo.sum() % 2 != 0:
+        raise(InvalidCubeError("an edge is flipped"))
+    if _parity(cp.tolist()) != _parity(ep.tolist()):
+        raise(InvalidCubeError("two pieces are swapped"))
+    return cp, co, ep, eo
+
+def to_state(cp, co, ep, eo):
+    """ Converts cubies back into the stickers of a Cube (vectorised)
+
+    Returns an array of shape (..., 54) with the standard colours.
+
+    """
+
+    cp, co, ep, eo = [np.asarray(array) for array in (cp, co, ep, eo)]
+    shape = cp.shape[:-1]
+    state = np.empty(shape + (54,), dtype=np.uint8)
+    state[..., 4::9] = np.arange(6)
+    twist = (np.arange(3) - co[..., None]) % 3
+    state[..., CORNER_FACELETS] = \
+        np.take_along_axis(CORNER_SIDES[cp], twist, axis=-1)
+    flip = (np.arange(2) + eo[..., None]) % 2
+    state[..., EDGE_FACELETS] = \
+        np.take_along_axis(EDGE_SIDES[ep], flip, axis=-1)
+    return state
+
+def multiply(a, b):
+    """ Applies the cubie permutation b to the cube a (vectorised on a) """
+
+    cp = np.take_along_axis(a[0], np.broadcast_to(b[0], a[0].shape), -1)
+    co = (np.take_along_axis(a[1], np.broadcast_to(b[0], a[1].shape), -1)
+          + b[1]) % 3
+    ep = np.take_along_axis(a[2], np.broadcast_to(b[2], a[2].shape), -1)
+    eo = (np.take_along_axis(a[3], np.broadcast_to(b[2], a[3].shape), -1)
+          + b[3]) % 2
+    return (cp, co, ep, eo)
+
+# Every move of Cube.rotation_types as cubies, read from its stickers
+MOVE_CUBIES = dict((move, from_state(Cube().state[MOVES[move]]))
+                   for move in Cube.rotation_types)
+
+
+def rank_permutations(perms):
+    """ Lexicographic rank of permutations of range(n) (vectorised) """
+
+    perms = np.asarray(perms)
+    n     = perms.shape[-1]
+    rank  = np.zeros(perms.shape[:-1], dtype=np.int64)
+    for i in range(n - 1):
+        smaller = (perms[..., i+1:] < perms[..., i:i+1]).sum(axis=-1)
+        rank    = rank * (n - i) + smaller
+    return rank
+
+def unrank_permutations(ranks, n):
+    """ Inverse of rank_permutations() """
+
+    ranks = np.asarray(ranks, dtype=np.int64)
+    perms = np.empty(ranks.shape + (n,), dtype=np.intp)
+    left  = np.broadcast_to(np.arange(n), ranks.shape + (n,)).copy()
+    for i in range(n):
+        base  = factorial(n - 1 - i)
+        digit = (ranks // base) % (n - i)
+        perms[..., i] = np.take_along_axis(left, digit[..., None], -1)[..., 0]
+        # remove the used element keeping the others in order
+        keep = np.arange(n - i - 1)
+        keep = keep + (keep >= digit[..., None])
+        left = np.take_along_axis(left, keep, -1)
+    return perms
+
+def rank_positions(positions, n):
+    """ Rank of the distinct positions (among n) of k tracked pieces
+
+    The positions, in the order of the pieces, have n!/(n-k)! possible
+    values (vectorised).
+
+    """
+
+    positions = np.asarray(positions)
+    k    = positions.shape[-1]
+    rank = np.zeros(positions.shape[:-1], dtype=np.int64)
+    for i in range(k):
+        earlier = (positions[..., :i] < positions[..., i:i+1]).sum(axis=-1)
+        rank    = rank * (n - i) + positions[..., i] - earlier
+    return rank
+
+def unrank_positions(ranks, n, k):
+    """ Inverse of rank_positions() """
+
+    ranks  = np.asarray(ranks, dtype=np.int64)
+    digits = []
+    for i in reversed(range(k)):
+        digits.append(ranks % (n - i))
+        ranks = ranks // (n - i)
+    digits.reverse()
+    free      = np.broadcast_to(np.arange(n), ranks.shape + (n,)).copy()
+    positions = np.empty(ranks.shape + (k,), dtype=np.intp)
+    for i in range(k):
+        positions[..., i] = \
+            np.take_along_axis(free, digits[i][..., None], -1)[..., 0]
+        keep = np.arange(n - i - 1)
+        keep = keep + (keep >= digits[i][..., None])
+        free = np.take_along_axis(free, keep, -1)
+    return positions
+
+def twist(co):
+    """ Coordinate (0 to 2186) of the twist of the corners """
+
+    co = np.asarray(co)
+    return (co[..., :7] * 3 ** np.arange(6, -1, -1)).sum(axis=-1)
+
+def untwist(coordinate):
+    """ Inverse of twist() """
+
+    coordinate = np.asarray(coordinate, dtype=np.int64)
+    co = (coordinate[..., None] // 3 ** np.arange(6, -1, -1)) % 3
+    return np.concatenate([co, (-co.sum(axis=-1, keepdims=True)) % 3], -1)
+
+def flip(eo):
+    """ Coordinate (0 to 2047) of the flip of the edges """
+
+    eo = np.asarray(eo)
+    return (eo[..., :11] << np.arange(10, -1, -1)).sum(axis=-1)
+
+def unflip(coordinate):
+    """ Inverse of flip() """
+
+    coordinate = np.asarray(coordinate, dtype=np.int64)
+    eo = (coordinate[..., None] >> np.arange(10, -1, -1)) & 1
+    return np.concatenate([eo, eo.sum(axis=-1, keepdims=True) % 2], -1)
+
+def permutation_parity(perms):
+    """ 0 for even permutations, 1 for odd ones (vectorised) """
+
+    perms = np.asarray(perms)
+    n     = perms.shape[-1]
+    inversions = np.zeros(perms.shape[:-1], dtype=np.int64)
+    for i in range(n - 1):
+        inversions += (perms[..., i+1:] < perms[..., i:i+1]).sum(axis=-1)
+    return inversions % 2
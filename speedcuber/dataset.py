@@ -0,0 +1,135 @@
+""" Binary files of many cubes
+
+A dataset file stores cubes as their 54 stickers, one byte each, after a
+small header:
+
+  * magic bytes, format version and record size (54), padded to
+    DATA_OFFSET bytes
+  * every cube, in the order they were appended
+
+The number of cubes is the size of the file, so appending is only
+writing at its end (a record cut short by a crash is ignored). Reading
+maps the file in memory: Dataset.states() is a zero-copy (N, 54) array,
+the batched representation of speedcuber.batch, and loading millions of
+cubes is only as slow as reading the file.
+
+    dataset = Dataset('scrambles.cubes', 'a')
+    dataset.append(cube)
+    dataset.append(states)              # an (N, 54) array
+    dataset.close()
+
+    with Dataset('scrambles.cubes') as dataset:
+        cube   = dataset[42]
+        states = dataset.states()
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+import os
+import mmap
+import struct
+
+from speedcuber.cube import Cube
+
+FORMAT_VERSION = 1
+RECORD_SIZE    = 54
+DATA_OFFSET    = 64
+_MAGIC         = b'SCDSET'
+# magic, format version, record size
+_HEADER        = struct.Struct('<6sBH')
+
+
+class Dataset:
+    """ A file of cubes, appended to and read by index
+
+    mode is 'r' to read an existing file, or 'a' to also append to it
+    (it is created if missing). ValueError is raised if the file isn't a
+    dataset.
+
+    """
+
+    def __init__(self, filename, mode='r'):
+        if mode not in ('r', 'a'):
+            raise(ValueError("mode must be 'r' or 'a', not %r" % (mode,)))
+        if mode == 'a' and not os.path.exists(filename):
+            file_handle = open(filename, 'wb')
+            file_handle.write(_HEADER.pack(_MAGIC, FORMAT_VERSION,
+                                           RECORD_SIZE).ljust(DATA_OFFSET,
+                                                              b'\0'))
+            file_handle.close()
+        self.filename    = filename
+        self.mode        = mode
+        self.file_handle = open(filename, 'rb' if mode == 'r' else 'r+b')
+        header = self.file_handle.read(DATA_OFFSET)
+        if len(header) < DATA_OFFSET or \
+           _HEADER.unpack_from(header) != (_MAGIC, FORMAT_VERSION,
+                                           RECORD_SIZE):
+            self.file_handle.close()
+            raise(ValueError("%s is not a cube dataset" % filename))
+        self._mapped = None
+        self._states = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+    def __len__(self):
+        size = os.fstat(self.file_handle.fileno()).st_size
+        return (size - DATA_OFFSET) // RECORD_SIZE
+
+    def __getitem__(self, index):
+        """ The Cube at an index, or the states of a slice of them """
+
+        states = self.states()
+        if isinstance(index, slice):
+            return states[index]
+        cube = Cube()
+        cube.state = states[index].copy()
+        return cube
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def states(self):
+        """ Every state as a read-only (N, 54) array mapped from the file """
+
+        count = len(self)
+        if self._states is None or len(self._states) != count:
+            if count == 0:
+                return np.empty((0, RECORD_SIZE), dtype=np.uint8)
+            self._mapped = mmap.mmap(self.file_handle.fileno(),
+                                     DATA_OFFSET + count * RECORD_SIZE,
+                                     access=mmap.ACCESS_READ)
+            self._states = np.frombuffer(self._mapped, dtype=np.uint8,
+                                         count=count * RECORD_SIZE,
+                                         offset=DATA_OFFSET
+                                         ).reshape(count, RECORD_SIZE)
+        return self._states
+
+    def append(self, cubes):
+        """ Appends a Cube, a state, or an (N, 54) array of states """
+
+        if self.mode != 'a':
+            raise(ValueError("%s is opened read-only" % self.filename))
+        if isinstance(cubes, Cube):
+            cubes = cubes.state
+        states = np.ascontiguousarray(cubes, dtype=np.uint8)
+        if states.shape[-1:] != (RECORD_SIZE,) or states.ndim > 2:
+            raise(ValueError("states must be of shape (54,) or (N, 54)"))
+        # a record cut short by a crash is overwritten
+        self.file_handle.seek(DATA_OFFSET + len(self) * RECORD_SIZE)
+        self.file_handle.write(states.data)
+        self.file_handle.truncate()
+        self.file_handle.flush()
+
+    def close(self):
+        # the arrays returned by states() keep the mapping alive
+        self._states = None
+        self._mapped = None
+        self.file_handle.close()
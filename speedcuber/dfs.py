@@ -0,0 +1,94 @@
+""" In-place depth-first solver
+
+The search of solve_cpu_singlethread() (every canonical sequence, by
+increasing length), walked depth first on a single state: a move is
+applied to it when going down the tree and undone by the inverse move
+when coming back up, through one scratch buffer. No cube is copied and
+no sequence is replayed, so a node costs a couple of gathers into
+preallocated arrays whatever its depth.
+
+The last move of every sequence is not applied to the state at all: it
+is gathered into the scratch buffer, which is then checked.
+
+"""
+
+# External dependancy
+import numpy as np
+
+from speedcuber.cube  import Cube, MOVES, canonical_successors
+from speedcuber.stats import SearchStats
+
+_MOVES = len(Cube.rotation_types)
+# The permutation of every move and of its inverse, by move index
+_FORWARD  = [MOVES[move] for move in Cube.rotation_types]
+_BACKWARD = [MOVES[move.swapcase()] for move in Cube.rotation_types]
+
+
+def _successors():
+    """ Moves allowed after every pair of move indices (_MOVES for none) """
+
+    letters    = Cube.rotation_types + ['']
+    successors = canonical_successors(Cube.rotation_types)
+    return [tuple(Cube.rotation_types.index(move)
+                  for move in successors[(before_last, last)])
+            for before_last in letters for last in letters]
+
+_SUCCESSORS = _successors()
+
+
+def solve_dfs(cube, stats=None):
+    """ Solves the Cube depth first on a single state
+
+    Returns the same moves and attempts as solve_cpu_singlethread().
+
+    """
+
+    stats    = stats if stats is not None else SearchStats()
+    state    = cube.state.copy()
+    scratch  = np.empty_like(state)
+    solved   = np.repeat(state[4::9], 9)
+    path     = []
+    attempts = [1]
+    # bound once: the calls below write into the existing buffers ('clip'
+    # skips the bounds checks take() would buffer the output for)
+    gather   = state.take
+    # views compared byte by byte, without any temporary array
+    result   = memoryview(scratch)
+    target   = memoryview(solved)
+
+    def search(before_last, last, remaining):
+        allowed = _SUCCESSORS[before_last * (_MOVES + 1) + last]
+        if remaining == 1:
+            stats.generate(len(allowed))
+            for move in allowed:
+                attempts[0] += 1
+                gather(_FORWARD[move], None, scratch, 'clip')
+                if result == target:
+                    path.append(move)
+                    return True
+            return False
+        stats.expand()
+        for move in allowed:
+            gather(_FORWARD[move], None, scratch, 'clip')
+            state[...] = scratch
+            path.append(move)
+            if search(last, move, remaining - 1):
+                return True
+            path.pop()
+            gather(_BACKWARD[move], None, scratch, 'clip')
+            state[...] = scratch
+        return False
+
+    stats.enter_depth(0)
+    stats.generate()
+    if (state == solved).all():
+        stats.finish()
+        return '', attempts[0]
+    depth = 1
+    while True:
+        stats.enter_depth(depth)
+        if search(_MOVES, _MOVES, depth):
+            stats.finish()
+            return ''.join(Cube.rotation_types[move] for move in path), \
+                   attempts[0]
+        depth += 1
@@ -0,0 +1,136 @@
+""" Optimal solver: IDA* guided by pattern databases
+
+The search is a depth-first search of canonical sequences bounded by an
+estimate of the total length: a branch is cut as soon as its motions plus
+the pattern databases' estimate (see speedcuber.pattern) exceed the
+bound, and the bound grows until a solution is found. As the estimate
+never overestimates, the first solution is a shortest one.
+
+Every quarter turn is an odd permutation of the corners, so the length
+of any solution has the parity of the corner permutation and the bound
+grows by two motions at a time.
+
+"""
+
+# External dependancy
+import numpy as np
+
+from speedcuber.cube    import Cube, canonical_successors
+from speedcuber.cubie   import from_state, rank_permutations, \
+                               rank_positions, permutation_parity, twist
+from speedcuber         import pattern
+from speedcuber.pattern import CORNER_TWISTS, EDGE_FLIPS, EDGE_SUBSETS
+from speedcuber.stats   import SearchStats
+
+_MOVES = len(Cube.rotation_types)
+
+
+class Tables:
+    """ The coordinate move tables and pattern databases IDA* reads
+
+    Move tables are kept as memoryviews of flat arrays, since reading a
+    memoryview gives a Python int much faster than indexing numpy.
+
+    """
+
+    def __init__(self, directory=None):
+        self.corners = pattern.database('corners', directory)
+        self.edges   = [pattern.database('edges%d' % i, directory)
+                        for i in range(len(EDGE_SUBSETS))]
+        permutation_moves, twist_moves, position_moves, flip_moves = \
+            pattern.move_tables(directory)
+        self.permutation_moves = memoryview(permutation_moves.ravel())
+        self.twist_moves       = memoryview(twist_moves.ravel())
+        self.position_moves    = memoryview(position_moves.ravel())
+        self.flip_moves        = memoryview(flip_moves.ravel())
+        letters    = Cube.rotation_types + ['']
+        successors = canonical_successors(Cube.rotation_types)
+        self.successors = [[Cube.rotation_types.index(move)
+                            for move in successors[(before_last, last)]]
+                           for before_last in letters for last in letters]
+
+_tables = dict()
+
+def tables(directory=None):
+    """ Tables of a directory, loaded once per process """
+
+    if directory not in _tables:
+        _tables[directory] = Tables(directory)
+    return _tables[directory]
+
+
+def solve_optimal(cube, directory=None, stats=None):
+    """ Solves the Cube with the fewest quarter turns
+
+    The pattern databases are read from directory (by default
+    tables.TABLES_DIRECTORY), and generated there first if missing.
+
+    Returns the moves and the number of nodes visited. The depths of
+    stats are the successive bounds of the search.
+
+    """
+
+    stats = stats if stats is not None else SearchStats()
+    t     = tables(directory)
+    cp, co, ep, eo = from_state(cube.state)
+    positions = np.argsort(ep)
+    corner = int(rank_permutations(cp)), int(twist(co))
+    edges  = []
+    for subset in EDGE_SUBSETS:
+        tracked = positions[list(subset)]
+        edges.append(int(rank_positions(tracked, 12)))
+        edges.append(int((eo[tracked] << np.arange(5, -1, -1)).sum()))
+
+    corners, (edges0, edges1) = t.corners, t.edges
+    permutation_moves, twist_moves = t.permutation_moves, t.twist_moves
+    position_moves, flip_moves     = t.position_moves, t.flip_moves
+    successors = t.successors
+    path  = []
+    stats.begin()
+    nodes = [0]
+
+    def estimate(c, w, a, x, b, y):
+        index = c * CORNER_TWISTS + w
+        h = (corners[index >> 1] >> ((index & 1) << 2)) & 15
+        index = a * EDGE_FLIPS + x
+        h = max(h, (edges0[index >> 1] >> ((index & 1) << 2)) & 15)
+        index = b * EDGE_FLIPS + y
+        return max(h, (edges1[index >> 1] >> ((index & 1) << 2)) & 15)
+
+    def search(c, w, a, x, b, y, remaining, before_last, last):
+        allowed = successors[before_last * (_MOVES + 1) + last]
+        stats.expand(1, len(allowed))
+        for move in allowed:
+            nodes[0] += 1
+            nc = permutation_moves[c * _MOVES + move]
+            nw = twist_moves[w * _MOVES + move]
+            na = position_moves[a * _MOVES + move]
+            nx = x ^ flip_moves[a * _MOVES + move]
+            nb = position_moves[b * _MOVES + move]
+            ny = y ^ flip_moves[b * _MOVES + move]
+            h  = estimate(nc, nw, na, nx, nb, ny)
+            if h >= remaining:
+                continue
+            path.append(move)
+            if remaining == 1:
+                # so h == 0: the cube is solved
+                return True
+            if search(nc, nw, na, nx, nb, ny, remaining - 1, last, move):
+                return True
+            path.pop()
+        return False
+
+    h = estimate(*(corner + tuple(edges)))
+    stats.generate()
+    if h == 0:
+        stats.finish()
+        return '', 1
+    parity = int(permutation_parity(cp))
+    bound  = h + (h - parity) % 2
+    stats.enter_depth(bound)
+    while not search(*(corner + tuple(edges)), remaining=bound,
+                     before_last=_MOVES, last=_MOVES):
+        bound += 2
+        stats.enter_depth(bound)
+    stats.finish()
+    return ''.join(Cube.rotation_types[move] for move in path), nodes[0]
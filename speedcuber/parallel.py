@@ -0,0 +1,160 @@
+""" Multiprocess solver
+
+Every depth of the search (all canonical sequences of a given length) is
+split by the first moves of its sequences: each prefix is a task for a
+pool of worker processes, which get the cube as its 54 bytes and search
+every sequence starting with their prefix.
+
+The answer is the solution of the first prefix (in canonical_gen()
+order) that has one, so it is the sequence solve_cpu_singlethread()
+returns. As soon as a prefix finds a solution, the workers searching
+later prefixes are told to give up through a shared value.
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from speedcuber.cube  import Cube, MOVES, canonical_gen
+from speedcuber.batch import MOVE_TABLE, CANONICAL, NO_MOVE, is_solved
+from speedcuber.stats import SearchStats
+
+# Index of the first prefix known to have a solution, shared with the
+# workers (set by _initialise in every worker)
+_cutoff = None
+# Nodes a worker visits between two checks of _cutoff
+CHECK_INTERVAL = 4096
+
+
+class _Cancelled(Exception):
+    pass
+
+def _initialise(cutoff):
+    global _cutoff
+    _cutoff = cutoff
+
+def search_prefix(state, prefix, remaining, index=None):
+    """ First solution starting with prefix of len(prefix) + remaining moves
+
+    state is the Cube as 54 bytes. The sequences are searched depth
+    first in canonical_gen() order; the last move of every branch is
+    tried for all its canonical moves at once. Returns the moves, or None
+    if there is no such solution or if a prefix before index found one,
+    with the numbers of nodes generated and expanded.
+
+    """
+
+    state = np.frombuffer(state, dtype=np.uint8)
+    for move in prefix:
+        state = state[MOVES[move]]
+    letters = Cube.rotation_types + ['']
+    before_last = letters.index(prefix[-2]) if len(prefix) > 1 else NO_MOVE
+    last        = letters.index(prefix[-1]) if len(prefix) > 0 else NO_MOVE
+    if remaining == 0:
+        return (prefix if is_solved(state[None])[0] else None), 1, 0
+
+    path  = []
+    # nodes generated, expanded, and generated since the last check
+    nodes = [0, 0, 0]
+
+    def search(state, before_last, last, remaining):
+        moves = np.flatnonzero(CANONICAL[before_last, last])
+        nodes[0] += len(moves)
+        nodes[1] += 1
+        nodes[2] += len(moves)
+        if remaining == 1:
+            solved = np.flatnonzero(is_solved(state[MOVE_TABLE[moves]]))
+            if len(solved) > 0:
+                path.append(moves[solved[0]])
+                return True
+            return False
+        if nodes[2] >= CHECK_INTERVAL:
+            nodes[2] = 0
+            if index is not None and _cutoff is not None and \
+               _cutoff.value < index:
+                raise(_Cancelled)
+        for move in moves:
+            path.append(move)
+            if search(state[MOVE_TABLE[move]], last, move, remaining - 1):
+                return True
+            path.pop()
+        return False
+
+    try:
+        if search(state, before_last, last, remaining):
+            return prefix + ''.join(Cube.rotation_types[move]
+                                    for move in path), nodes[0], nodes[1]
+    except(_Cancelled):
+        pass
+    return None, nodes[0], nodes[1]
+
+
+def _found(future, index, cutoff):
+    """ Stops the workers of later prefixes once a prefix has a solution """
+
+    if future.cancelled() or future.exception() is not None or \
+       future.result()[0] is None:
+        return
+    with cutoff.get_lock():
+        cutoff.value = min(cutoff.value, index)
+
+def solve_parallel(cube, workers=None, prefix_length=2, stats=None):
+    """ Solves the Cube across worker processes
+
+    workers is the number of processes (by default one per CPU) and
+    prefix_length the number of first moves splitting each depth into
+    tasks (114 tasks per depth for 2).
+
+    Returns the same moves as solve_cpu_singlethread() and the number of
+    tasks run. stats counts the nodes of the tasks as their results come
+    back.
+
+    """
+
+    stats = stats if stats is not None else SearchStats()
+    state = cube.state.tobytes()
+    # the first depths are too small to be worth splitting
+    attempts = 0
+    for depth in range(prefix_length + 1):
+        stats.enter_depth(depth)
+        for moves in canonical_gen(Cube.rotation_types, depth):
+            attempts += 1
+            stats.generate()
+            if search_prefix(state, moves, 0)[0] is not None:
+                stats.finish()
+                return moves, attempts
+
+    prefixes = list(canonical_gen(Cube.rotation_types, prefix_length))
+    cutoff   = multiprocessing.Value('l', len(prefixes))
+    executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                   initializer=_initialise,
+                                   initargs=(cutoff,))
+    try:
+        remaining = 1
+        while True:
+            stats.enter_depth(prefix_length + remaining)
+            cutoff.value = len(prefixes)
+            futures = []
+            for index, prefix in enumerate(prefixes):
+                future = executor.submit(search_prefix, state, prefix,
+                                         remaining, index)
+                future.add_done_callback(
+                    lambda future, index=index: _found(future, index, cutoff))
+                futures.append(future)
+            attempts += len(futures)
+            # results are read in prefix order, so the first solution read
+            # is the one the serial solver finds
+            for future in futures:
+                moves, generated, expanded = future.result()
+                stats.expand(expanded, generated)
+                if moves is not None:
+                    return moves, attempts
+            remaining += 1
+    finally:
+        stats.finish()
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,211 @@
+""" Pattern databases for the optimal solver
+
+A pattern database stores, for every state of a part of the cube, the
+exact number of motions needed to solve that part alone. It never
+overestimates the motions needed for the whole cube, so the largest value
+of several databases is an admissible heuristic for IDA*.
+
+Three databases are built, with the 12 quarter turns of Cube:
+  * corners:         all 8 corners, 8! * 3^7 = 88179840 states
+  * edges 0 to 5:    6 edges, 12!/6! * 2^6 = 42577920 states
+  * edges 6 to 11:   the other 6 edges, same size
+
+They are generated once (a few minutes) and stored with two entries per
+byte in the table cache (see speedcuber.tables), read through mmap so
+every process using them shares the same pages of memory.
+
+"""
+
+# External dependancy
+import numpy as np
+
+from speedcuber        import tables
+from speedcuber.cube   import Cube
+from speedcuber.cubie import MOVE_CUBIES, SOLVED, \
+                             rank_permutations, unrank_permutations, \
+                             rank_positions, unrank_positions, \
+                             twist, untwist
+
+CORNER_PERMUTATIONS = 40320             # 8!
+CORNER_TWISTS       = 2187              # 3^7
+EDGE_POSITIONS      = 665280            # 12!/6!
+EDGE_FLIPS          = 64                # 2^6
+EDGE_SUBSETS        = (tuple(range(6)), tuple(range(6, 12)))
+
+UNKNOWN     = 255
+BLOCK_SIZE  = 1 << 21
+# Version of the stored tables, to bump when their content changes
+VERSION     = 1
+
+
+def _move_arrays():
+    """ The cubies of every move as arrays, in Cube.rotation_types order """
+
+    cubies = [MOVE_CUBIES[move] for move in Cube.rotation_types]
+    return [np.array([move[i] for move in cubies]) for i in range(4)]
+
+def corner_permutation_moves():
+    """ (40320, 12) table: corner permutation coordinate after each move """
+
+    cp   = unrank_permutations(np.arange(CORNER_PERMUTATIONS), 8)
+    move = _move_arrays()[0]
+    return rank_permutations(cp[:, move]).astype(np.uint16)
+
+def corner_twist_moves():
+    """ (2187, 12) table: corner twist coordinate after each move """
+
+    co = untwist(np.arange(CORNER_TWISTS))
+    move_cp, move_co = _move_arrays()[:2]
+    return twist((co[:, move_cp] + move_co) % 3).astype(np.uint16)
+
+def edge_position_moves():
+    """ Position and flip tables of 6 tracked edges
+
+    Returns a (665280, 12) table with the positions coordinate of the
+    tracked edges after each move, and a (665280, 12) table of the bits
+    (the first tracked edge is the highest bit) flipped by that move.
+
+    """
+
+    move_ep, move_eo = _move_arrays()[2:]
+    # where the edge at each position goes to
+    destination = np.argsort(move_ep, axis=1)
+    position_moves = np.empty((EDGE_POSITIONS, 12), dtype=np.uint32)
+    flip_moves     = np.empty((EDGE_POSITIONS, 12), dtype=np.uint8)
+    for block in range(0, EDGE_POSITIONS, BLOCK_SIZE // 16):
+        ranks     = np.arange(block, min(block + BLOCK_SIZE // 16,
+                                         EDGE_POSITIONS))
+        positions = unrank_positions(ranks, 12, 6)
+        moved     = destination[:, positions].transpose(1, 0, 2)
+        flipped   = np.take_along_axis(move_eo[None], moved, axis=2)
+        position_moves[ranks] = rank_positions(moved, 12)
+        flip_moves[ranks]     = (flipped << np.arange(5, -1, -1)).sum(axis=2)
+    return position_moves, flip_moves
+
+def corner_coordinate(cp, co):
+    """ Index of a cube in the corner database """
+
+    return int(rank_permutations(cp)) * CORNER_TWISTS + int(twist(co))
+
+def edge_coordinate(ep, eo, edges):
+    """ Index of a cube in the database of the given edges """
+
+    positions = np.argsort(ep)[list(edges)]
+    flips     = (eo[positions] << np.arange(5, -1, -1)).sum()
+    return int(rank_positions(positions, 12)) * EDGE_FLIPS + int(flips)
+
+
+def breadth_first(size, start, neighbours):
+    """ Distance to start of every state of a puzzle (vectorised BFS)
+
+    neighbours maps an array of states to the (N, 12) array of the
+    states one move away. The moves must include their inverses.
+    Once most states are reached, the unreached ones look for a
+    neighbour at the current depth instead, which is faster.
+
+    """
+
+    distance = np.full(size, UNKNOWN, dtype=np.uint8)
+    distance[start] = 0
+    depth, reached = 0, 1
+    while True:
+        at_depth = int(np.count_nonzero(distance == depth))
+        forward  = at_depth < size - reached
+        found    = 0
+        for block in range(0, size, BLOCK_SIZE):
+            chunk = distance[block:block+BLOCK_SIZE]
+            if forward == True:
+                states = block + np.flatnonzero(chunk == depth)
+                states = neighbours(states).ravel()
+                states = np.unique(states[distance[states] == UNKNOWN])
+            else:
+                states = block + np.flatnonzero(chunk == UNKNOWN)
+                near   = (distance[neighbours(states)] == depth).any(axis=1)
+                states = states[near]
+            distance[states] = depth + 1
+            found += len(states)
+        if found == 0:
+            return distance
+        reached += found
+        depth   += 1
+
+def pack(distance):
+    """ Stores two distances per byte (the even index in the low nibble) """
+
+    if len(distance) % 2 == 1:
+        distance = np.append(distance, 0)
+    return (distance[0::2] & 15) | (distance[1::2] << 4)
+
+def unpack(packed, index):
+    """ Reads one distance from a packed table """
+
+    return (packed[index >> 1] >> ((index & 1) << 2)) & 15
+
+
+def build_corners():
+    """ Distances of every corner state to the solved corners """
+
+    permutation_moves = corner_permutation_moves().astype(np.int64)
+    twist_moves       = corner_twist_moves().astype(np.int64)
+
+    def neighbours(states):
+        return permutation_moves[states // CORNER_TWISTS] * CORNER_TWISTS \
+             + twist_moves[states % CORNER_TWISTS]
+
+    size = CORNER_PERMUTATIONS * CORNER_TWISTS
+    start = corner_coordinate(SOLVED[0], SOLVED[1])
+    return breadth_first(size, start, neighbours)
+
+def build_edges(edges):
+    """ Distances of every state of 6 edges to the solved edges """
+
+    position_moves, flip_moves = edge_position_moves()
+    position_moves = position_moves.astype(np.int64)
+
+    def neighbours(states):
+        positions = states // EDGE_FLIPS
+        flips     = (states % EDGE_FLIPS)[:, None] ^ flip_moves[positions]
+        return position_moves[positions] * EDGE_FLIPS + flips
+
+    size = EDGE_POSITIONS * EDGE_FLIPS
+    start = edge_coordinate(SOLVED[2], SOLVED[3], edges)
+    return breadth_first(size, start, neighbours)
+
+def move_tables(directory=None):
+    """ The move tables of the databases, from the table cache
+
+    Returns the corner permutation, corner twist, edge position and edge
+    flip tables (see the functions building them), as read-only arrays.
+
+    """
+
+    def build():
+        position_moves, flip_moves = edge_position_moves()
+        return {'corner_permutations': corner_permutation_moves(),
+                'corner_twists':       corner_twist_moves(),
+                'edge_positions':      position_moves,
+                'edge_flips':          flip_moves}
+
+    names = ('corner_permutations', 'corner_twists', 'edge_positions',
+             'edge_flips')
+    moves = tables.cached('moves', names, build, VERSION, directory)
+    return tuple(moves[name] for name in names)
+
+def database(name, directory=None):
+    """ Loads a pattern database, generating it first if needed
+
+    name is 'corners', 'edges0' (edges 0 to 5) or 'edges1' (edges 6 to
+    11). Returns a memoryview of the packed distances (read with
+    unpack()).
+
+    """
+
+    def build():
+        if name == 'corners':
+            distance = build_corners()
+        else:
+            distance = build_edges(EDGE_SUBSETS[int(name[-1])])
+        return {name: pack(distance)}
+
+    packed = tables.cached('pattern', [name], build, VERSION, directory)
+    return memoryview(packed[name])
@@ -0,0 +1,124 @@
+""" Bulk scramble generator
+
+scrambles() makes N scrambles at once: the random moves of every step
+are drawn for all the cubes together and applied with a single gather,
+so millions of scrambles take seconds. The moves are canonical
+sequences (see canonical_gen()), never undoing or repeating the previous
+ones, drawn uniformly among the moves allowed at each step.
+
+Alternatively, uniformly random states of the whole cube group can be
+drawn directly from random cubies (which is what a competition scramble
+aims for), without any move list.
+
+Every call takes a seed (or a numpy Generator), so the same corpus of
+scrambles can be generated again.
+
+"""
+
+# External dependancy
+import numpy as np
+
+from speedcuber.cube  import Cube
+from speedcuber.batch import MOVE_TABLE, CANONICAL, NO_MOVE
+from speedcuber.cubie import to_state, permutation_parity
+
+# The moves allowed after every pair of last moves (before_last * 13 +
+# last), padded, and how many there are
+_ALLOWED = np.array([np.resize(np.flatnonzero(allowed), NO_MOVE)
+                     for allowed in CANONICAL.reshape(-1, NO_MOVE)])
+_COUNTS  = CANONICAL.reshape(-1, NO_MOVE).sum(axis=1)
+# The permutation of every sequence of 3 moves (index a * 144 + b * 12 +
+# c), so scrambles are applied three moves per gather
+_BLOCK        = 3
+_BLOCK_MOVES  = MOVE_TABLE[:, MOVE_TABLE].reshape(-1, 54)[:, MOVE_TABLE] \
+                .reshape(-1, 54)
+_BLOCK_DIGITS = NO_MOVE ** np.arange(_BLOCK - 1, -1, -1)
+# Scrambles applied at once, to stay in the processor's cache
+CHUNK_SIZE    = 16384
+
+
+def _generator(seed):
+    if isinstance(seed, np.random.Generator):
+        return seed
+    return np.random.default_rng(seed)
+
+def random_moves(n, length, seed=None):
+    """ n random canonical sequences of length moves
+
+    Returns an (n, length) array of indices into Cube.rotation_types.
+
+    """
+
+    rng   = _generator(seed)
+    moves = np.empty((n, length), dtype=np.uint8)
+    last_two = np.full(n, NO_MOVE * (NO_MOVE + 1) + NO_MOVE, dtype=np.intp)
+    for step in range(length):
+        chosen = (rng.random(n) * _COUNTS[last_two]).astype(np.intp)
+        move   = _ALLOWED[last_two, chosen]
+        moves[:, step] = move
+        last_two = last_two % (NO_MOVE + 1) * (NO_MOVE + 1) + move
+    return moves
+
+def apply_sequences(states, moves):
+    """ Applies a sequence of moves to every cube of an (N, 54) array
+
+    moves is an (N, length) array of move indices, one sequence per cube.
+    Returns the new states.
+
+    """
+
+    states = np.array(states, dtype=np.uint8)
+    moves  = np.asarray(moves, dtype=np.intp)
+    length = moves.shape[1]
+    for start in range(0, len(states), CHUNK_SIZE):
+        chunk    = states[start:start+CHUNK_SIZE]
+        sequence = moves[start:start+CHUNK_SIZE]
+        step = 0
+        while step < length:
+            if step + _BLOCK <= length:
+                permutations = _BLOCK_MOVES[sequence[:, step:step+_BLOCK]
+                                            @ _BLOCK_DIGITS]
+                step += _BLOCK
+            else:
+                permutations = MOVE_TABLE[sequence[:, step]]
+                step += 1
+            chunk = np.take_along_axis(chunk, permutations, axis=1)
+        states[start:start+CHUNK_SIZE] = chunk
+    return states
+
+def random_states(n, seed=None):
+    """ n uniformly random solvable states, as an (n, 54) array """
+
+    rng = _generator(seed)
+    cp  = rng.permuted(np.tile(np.arange(8), (n, 1)), axis=1)
+    ep  = rng.permuted(np.tile(np.arange(12), (n, 1)), axis=1)
+    # corners and edges need the same parity: swapping two edges fixes it
+    odd = permutation_parity(cp) != permutation_parity(ep)
+    ep[odd, 0], ep[odd, 1] = ep[odd, 1], ep[odd, 0].copy()
+    co  = rng.integers(0, 3, (n, 8))
+    co[:, 7] = -co[:, :7].sum(axis=1) % 3
+    eo  = rng.integers(0, 2, (n, 12))
+    eo[:, 11] = eo[:, :11].sum(axis=1) % 2
+    return to_state(cp, co, ep, eo)
+
+def scrambles(n, length=25, seed=None, uniform=False):
+    """ n scrambled cubes
+
+    Returns the moves, as an (n, length) array of indices into
+    Cube.rotation_types (see to_strings()), and the (n, 54) array of the
+    scrambled states. With uniform, the states are uniformly random
+    instead, and the moves are None.
+
+    """
+
+    if uniform == True:
+        return None, random_states(n, seed)
+    moves  = random_moves(n, length, seed)
+    states = apply_sequences(np.repeat(Cube().state[None], n, axis=0), moves)
+    return moves, states
+
+def to_strings(moves):
+    """ Converts an (n, length) array of move indices to n strings """
+
+    letters = np.array(Cube.rotation_types)
+    return [''.join(row) for row in letters[np.asarray(moves)]]
@@ -0,0 +1,278 @@
+""" Asynchronous solving, and a small local solve server
+
+SolveService solves cubes from asyncio code: every search runs in a
+thread of its own executor, so the event loop keeps serving other
+requests while it runs.
+
+    service = SolveService(workers=4, max_pending=64)
+    moves, _ = await service.solve(cube, timeout=5)
+
+At most workers searches run at once; the others wait in line for a
+slot, and a request arriving when max_pending are already running or
+waiting is turned down at once with ServiceBusy, instead of waiting
+behind all of them.
+
+Every request may have a deadline, which counts the time spent waiting
+in line. Searches are stopped cooperatively: a search that reaches its
+deadline, or whose caller is cancelled, is told so through its
+SearchStats (see speedcuber.stats), and stops within a few thousand
+nodes, freeing its slot. The caller gets asyncio.TimeoutError as soon as
+the deadline passes.
+
+With a SolutionCache (see speedcuber.solutions), cubes already solved
+are answered from it at once, without taking a slot.
+
+The local server speaks JSON lines over TCP:
+
+    python -m speedcuber.service [--host 127.0.0.1] [--port 8765]
+
+Every line sent is a cube in the format of Cube.dump(), with optional
+"id", "method" and "timeout" elements, and is answered by one line, as
+soon as it is solved (so not necessarily in order, the ids tell them
+apart):
+
+    {"id": ..., "moves": "FRu", "length": 3}
+    {"id": ..., "error": "..."}
+
+"""
+
+# From Python Standard Library
+import os
+import asyncio
+import argparse
+from json               import loads as jsonloads
+from json               import dumps as jsondumps
+from threading          import Event
+from functools          import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from speedcuber.cube      import Cube
+from speedcuber.bulk      import METHODS
+from speedcuber.stats     import SearchStats, SearchCancelled, SearchTimeout
+from speedcuber.solutions import SolutionCache
+
+# Requests running or waiting in line, per worker, unless told otherwise
+PENDING_PER_WORKER = 8
+DEFAULT_HOST       = '127.0.0.1'
+DEFAULT_PORT       = 8765
+
+
+class ServiceBusy(Exception):
+    """ The service has too many pending requests to take another one """
+
+
+def _solve(cube, method, stats):
+    return getattr(cube, METHODS[method])(stats=stats)
+
+
+class SolveService:
+    """ Solves cubes for asyncio code (see the module documentation)
+
+    workers is the number of searches run at once (by default one per
+    CPU), max_pending the number of requests running or waiting in line
+    (by default PENDING_PER_WORKER per worker), method and timeout the
+    defaults of solve(), and cache a SolutionCache looked up before
+    solving with its method.
+
+    """
+
+    def __init__(self, workers=None, max_pending=None, method='twophase',
+                 timeout=None, cache=None):
+        if method not in METHODS:
+            raise(ValueError("unknown method %r" % (method,)))
+        self.workers     = workers or os.cpu_count()
+        self.max_pending = max_pending or self.workers * PENDING_PER_WORKER
+        self.method      = method
+        self.timeout     = timeout
+        self.cache       = cache
+        self.pending     = 0
+        self._slots      = asyncio.Semaphore(self.workers)
+        self._cancels    = set()
+        self._executor   = ThreadPoolExecutor(max_workers=self.workers,
+                                              thread_name_prefix='speedcuber')
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exception):
+        self.close()
+
+    async def solve(self, cube, method=None, timeout=None):
+        """ Solves a Cube and returns what its solve method returns
+
+        Raises ServiceBusy if max_pending requests are pending,
+        asyncio.TimeoutError if the cube isn't solved within timeout
+        seconds, and whatever the solve method raises (InvalidCubeError
+        for a cube that can't be solved...).
+
+        """
+
+        method  = method or self.method
+        timeout = timeout if timeout is not None else self.timeout
+        if method not in METHODS:
+            raise(ValueError("unknown method %r" % (method,)))
+        cache = self.cache if self.cache is not None and \
+                              self.cache.method == method else None
+        if cache is not None:
+            moves = cache.lookup(cube)
+            if moves is not None:
+                return moves, 0
+        if self.pending >= self.max_pending:
+            raise(ServiceBusy("%d requests are already pending"
+                              % self.pending))
+        loop     = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        self.pending += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout)
+        except(asyncio.TimeoutError):
+            self.pending -= 1
+            raise(asyncio.TimeoutError("no worker was free in %g seconds"
+                                       % timeout))
+        except(BaseException):
+            self.pending -= 1
+            raise
+        # the slot is freed once the search is over, which is later than
+        # the caller gives up if the search is still running
+        cancel = Event()
+        self._cancels.add(cancel)
+        remaining = None if deadline is None else \
+                    max(deadline - loop.time(), 0)
+        stats  = SearchStats(cancel=cancel, timeout=remaining)
+        future = loop.run_in_executor(self._executor, _solve, cube.copy(),
+                                      method, stats)
+        future.add_done_callback(partial(self._release, cancel))
+        try:
+            done, _ = await asyncio.wait([future], timeout=remaining)
+        except(asyncio.CancelledError):
+            cancel.set()
+            raise
+        if not done:
+            cancel.set()
+            raise(asyncio.TimeoutError("not solved in %g seconds" % timeout))
+        try:
+            result = future.result()
+        except(SearchTimeout):
+            raise(asyncio.TimeoutError("not solved in %g seconds" % timeout))
+        if cache is not None:
+            cache.store(cube, result[0])
+        return result
+
+    def _release(self, cancel, future):
+        self._cancels.discard(cancel)
+        self.pending -= 1
+        self._slots.release()
+        # the caller may be gone, the result is retrieved for it
+        if not future.cancelled():
+            future.exception()
+
+    def close(self):
+        """ Cancels every search running or waiting, and stops the threads """
+
+        for cancel in list(self._cancels):
+            cancel.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _answer(service, line, number, writer):
+    identifier = number
+    try:
+        dictionary = jsonloads(line)
+        identifier = dictionary.get("id", number)
+        cube = Cube()
+        cube.loads(line)
+        moves, _ = await service.solve(cube, dictionary.get("method"),
+                                       dictionary.get("timeout"))
+        result = {"id": identifier, "moves": moves, "length": len(moves)}
+    except(ValueError, KeyError, TypeError, AttributeError, MemoryError,
+           ServiceBusy, SearchCancelled, asyncio.TimeoutError) as error:
+        result = {"id": identifier,
+                  "error": "%s: %s" % (type(error).__name__, error)}
+    writer.write((jsondumps(result) + "\n").encode('utf-8'))
+    await writer.drain()
+
+async def _connection(service, reader, writer):
+    """ Answers every line of a connection, each as soon as it's solved """
+
+    answers = set()
+    number  = 0
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            if line.strip():
+                answer = asyncio.ensure_future(
+                    _answer(service, line.decode('utf-8'), number, writer))
+                answers.add(answer)
+                answer.add_done_callback(answers.discard)
+            number += 1
+        # the client may stop sending before it has read every answer
+        if answers:
+            await asyncio.wait(answers)
+    except(ConnectionError, ValueError):
+        pass
+    finally:
+        # a closed connection cancels the searches it still waits for
+        for answer in answers:
+            answer.cancel()
+        writer.close()
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, service=None):
+    """ Starts the solve server, and returns its asyncio.Server
+
+    Cubes are solved by service, by default a SolveService with one
+    worker per CPU.
+
+    """
+
+    service = service or SolveService()
+    return await asyncio.start_server(partial(_connection, service),
+                                      host, port)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m speedcuber.service",
+        description="Serves cube solutions as JSON lines over TCP.")
+    parser.add_argument("--host", default=DEFAULT_HOST,
+                        help="address to listen on (default: %s)"
+                        % DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT,
+                        help="port to listen on (default: %d)" % DEFAULT_PORT)
+    parser.add_argument("-m", "--method", default="twophase",
+                        choices=sorted(METHODS),
+                        help="default solver (default: twophase)")
+    parser.add_argument("-w", "--workers", type=int, default=None,
+                        help="searches run at once (default: one per CPU)")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="requests running or waiting before new ones "
+                             "are turned down")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="default seconds allowed per request")
+    parser.add_argument("--cache", default=None,
+                        help="SQLite file of solutions already found")
+    arguments = parser.parse_args(arguments)
+
+    async def run():
+        cache   = None
+        if arguments.cache is not None:
+            cache = SolutionCache(filename=arguments.cache,
+                                  method=arguments.method)
+        service = SolveService(arguments.workers, arguments.max_pending,
+                               arguments.method, arguments.timeout, cache)
+        server  = await serve(arguments.host, arguments.port, service)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            service.close()
+
+    try:
+        asyncio.run(run())
+    except(KeyboardInterrupt):
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+""" Cache of solutions, in front of the solvers
+
+A SolutionCache remembers the moves solving every cube it has seen, so
+a cube seen before is answered without any search. Cubes are keyed by
+their canonical state (see speedcuber.symmetry), once their colours are
+renamed after the sides of their centres: cubes that only differ by
+their colour scheme, or by a symmetry (a rotation or reflection of the
+whole cube), share an entry, and the stored moves are turned into the
+moves solving each of them.
+
+There are two tiers:
+  * memory: the most recently used solutions (an LRU of max_entries)
+  * disk, optional: an SQLite file, which survives restarts and can be
+    shared by worker processes (every process opens its own connection,
+    writes go through SQLite's write-ahead log)
+
+Entries of different solvers are kept apart, as their solutions differ.
+
+    cache = SolutionCache(filename='solutions.sqlite')
+    moves, _ = cache.solve(cube)        # solved, then stored
+    moves, _ = cache.solve(cube)        # found in a few microseconds
+    print(cache.as_dict())
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+import os
+import sqlite3
+from collections import OrderedDict
+
+from speedcuber.symmetry      import canonical, transform_moves, INVERSES
+from speedcuber.transposition import state_key
+
+# Solutions kept in memory unless told otherwise
+MAX_ENTRIES = 100000
+# Seconds a process waits for another one writing to the disk tier
+DISK_TIMEOUT = 30
+_SIDES = np.arange(6, dtype=np.uint8)
+
+
+def cache_key(state):
+    """ Key of a state in the cache, and the symmetry giving it
+
+    Returns None for a state whose centres aren't all different, or with
+    a colour that isn't the colour of a centre, which isn't a cube the
+    cache can tell apart.
+
+    """
+
+    state   = np.asarray(state, dtype=np.uint8)
+    # every colour renamed after the side of its centre
+    sides   = np.full(256, 255, dtype=np.uint8)
+    sides[state[4::9]] = _SIDES
+    if (sides[state[4::9]] != _SIDES).any():
+        return None
+    renamed = sides[state]
+    if (renamed == 255).any():
+        return None
+    representative, symmetry = canonical(renamed)
+    return state_key(representative), symmetry
+
+
+class SolutionCache:
+    """ Solutions of the cubes already solved (see the module documentation)
+
+    max_entries caps the solutions kept in memory, filename is the SQLite
+    file of the disk tier (None for none), and method the solver used on
+    a miss, as in speedcuber.bulk.METHODS.
+
+    memory_hits, disk_hits and misses count what happened to the
+    lookups, and evictions the solutions dropped from memory.
+
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, filename=None,
+                 method='twophase'):
+        # imported here as speedcuber.bulk depends on this module
+        from speedcuber.bulk import METHODS
+        if method not in METHODS:
+            raise(ValueError("unknown method %r" % (method,)))
+        self.max_entries = max_entries
+        self.filename    = filename
+        self.method      = method
+        self._solve      = METHODS[method]
+        self.entries     = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits   = 0
+        self.misses      = 0
+        self.evictions   = 0
+        self._connection = None
+        self._pid        = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, cube):
+        return self.lookup(cube, count=False) is not None
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    def _database(self):
+        """ The connection to the disk tier, opened once per process """
+
+        if self._pid != os.getpid():
+            self._connection = sqlite3.connect(self.filename,
+                                               timeout=DISK_TIMEOUT,
+                                               isolation_level=None)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS solutions ("
+                "method TEXT NOT NULL, state BLOB NOT NULL, "
+                "moves TEXT NOT NULL, PRIMARY KEY (method, state)) "
+                "WITHOUT ROWID")
+            self._pid = os.getpid()
+        return self._connection
+
+    def _remember(self, key, moves):
+        self.entries[key] = moves
+        self.entries.move_to_end(key)
+        if self.max_entries is not None and \
+           len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def lookup(self, cube, count=True):
+        """ The moves solving a Cube, or None if it isn't in the cache """
+
+        found = cache_key(cube.state)
+        if found is None:
+            return None
+        key, symmetry = found
+        moves = self.entries.get(key)
+        if moves is not None:
+            self.entries.move_to_end(key)
+            if count == True:
+                self.memory_hits += 1
+        elif self.filename is not None:
+            row = self._database().execute(
+                "SELECT moves FROM solutions WHERE method = ? AND state = ?",
+                (self.method, key)).fetchone()
+            if row is not None:
+                moves = row[0]
+                self._remember(key, moves)
+                if count == True:
+                    self.disk_hits += 1
+        if moves is None:
+            if count == True:
+                self.misses += 1
+            return None
+        # the moves stored solve the representative
+        return transform_moves(moves, INVERSES[symmetry])
+
+    def store(self, cube, moves):
+        """ Remembers the moves solving a Cube, in both tiers """
+
+        found = cache_key(cube.state)
+        if found is None:
+            return
+        key, symmetry = found
+        moves = transform_moves(moves, symmetry)
+        self._remember(key, moves)
+        if self.filename is not None:
+            self._database().execute(
+                "INSERT OR IGNORE INTO solutions VALUES (?, ?, ?)",
+                (self.method, key, moves))
+
+    def solve(self, cube, stats=None):
+        """ Solves a Cube, through the cache
+
+        Returns what the solve method returns, with 0 attempts for a
+        cube found in the cache.
+
+        """
+
+        moves = self.lookup(cube)
+        if moves is not None:
+            return moves, 0
+        moves, attempts = getattr(cube, self._solve)(stats=stats)
+        self.store(cube, moves)
+        return moves, attempts
+
+    def clear(self):
+        """ Forgets the solutions kept in memory (not those on disk) """
+
+        self.entries.clear()
+
+    def close(self):
+        if self._connection is not None and self._pid == os.getpid():
+            self._connection.close()
+        self._connection = None
+        self._pid        = None
+
+    def as_dict(self):
+        """ The statistics of the cache as a dictionary """
+
+        lookups = self.hits + self.misses
+        return {'memory_hits': self.memory_hits,
+                'disk_hits':   self.disk_hits,
+                'misses':      self.misses,
+                'evictions':   self.evictions,
+                'entries':     len(self.entries),
+                'hit_rate':    self.hits / lookups if lookups else 0.0}
@@ -0,0 +1,169 @@
+""" Statistics of a search, and progress reports while it runs
+
+Every solver takes an optional SearchStats and fills it in as it
+searches:
+  * generated: states (or move sequences) produced and checked
+  * expanded: states whose successors were produced
+  * duplicates: states skipped as already reached by other moves
+  * depth_seconds: wall time spent at every depth of the search (the
+    meaning of a depth depends on the solver: the length of the move
+    lists tried, the bound of IDA*, the phase 1 length of two-phase...)
+  * peak_table_size: the most states kept in memory at once, for the
+    solvers that keep any
+
+A progress callback can be given, which is called with the SearchStats
+every interval seconds (at most) while the search runs:
+
+    stats = SearchStats(progress=lambda stats: print(stats.as_dict()),
+                        interval=5)
+    moves, _ = cube.solve_optimal(stats=stats)
+    print(stats.nodes_per_second)
+
+A search can also be stopped from another thread: it checks cancel (a
+threading.Event) and its deadline at the same time it looks at the
+clock, and raises SearchCancelled (or SearchTimeout) from inside the
+solver once either is reached:
+
+    cancel = threading.Event()
+    stats  = SearchStats(cancel=cancel, timeout=30)
+
+"""
+
+# From Python Standard Library
+from time import perf_counter
+
+# Nodes generated between two looks at the clock
+CHECK_NODES = 1024
+
+
+class SearchCancelled(Exception):
+    """ The search was cancelled before it found a solution """
+
+class SearchTimeout(SearchCancelled):
+    """ The search reached its deadline before it found a solution """
+
+
+class SearchStats:
+    """ Counters of a search (see the module documentation)
+
+    cancel is an object with an is_set() method (a threading.Event), and
+    timeout the seconds the search may run from now, tables loading
+    included.
+
+    """
+
+    def __init__(self, progress=None, interval=1.0, cancel=None,
+                 timeout=None):
+        self.progress        = progress
+        self.interval        = interval
+        self.cancel          = cancel
+        self.generated       = 0
+        self.expanded        = 0
+        self.duplicates      = 0
+        self.depth           = None
+        self.depth_seconds   = dict()
+        self.peak_table_size = 0
+        self.start           = perf_counter()
+        self.end             = None
+        self.deadline        = None if timeout is None else \
+                               self.start + timeout
+        self._depth_start    = self.start
+        self._last_report    = self.start
+        self._next_check     = CHECK_NODES
+
+    def begin(self):
+        """ Restarts the clock, once a solver is done loading its tables """
+
+        self.start        = perf_counter()
+        self._depth_start = self.start
+        self._last_report = self.start
+
+    @property
+    def elapsed(self):
+        """ Seconds since the search started (until it finished) """
+
+        end = self.end if self.end is not None else perf_counter()
+        return end - self.start
+
+    @property
+    def nodes_per_second(self):
+        elapsed = self.elapsed
+        return self.generated / elapsed if elapsed > 0 else 0.0
+
+    def generate(self, nodes=1):
+        """ Counts nodes generated """
+
+        self.generated += nodes
+        if self.generated >= self._next_check:
+            self.tick()
+
+    def expand(self, nodes=1, generated=0):
+        """ Counts nodes expanded, and the nodes they generated """
+
+        self.expanded += nodes
+        self.generate(generated)
+
+    def duplicate(self, nodes=1):
+        """ Counts nodes pruned as already reached """
+
+        self.duplicates += nodes
+
+    def table_size(self, size):
+        """ Records the number of states the search keeps """
+
+        if size > self.peak_table_size:
+            self.peak_table_size = size
+
+    def enter_depth(self, depth):
+        """ Starts timing a new depth of the search """
+
+        now = perf_counter()
+        self._close_depth(now)
+        self.depth        = depth
+        self._depth_start = now
+
+    def finish(self):
+        """ Stops the clocks, once the search is over """
+
+        self.end = perf_counter()
+        self._close_depth(self.end)
+
+    def tick(self):
+        """ Calls the progress callback if interval seconds have passed
+
+        Raises SearchCancelled if the search was cancelled, or
+        SearchTimeout if its deadline has passed.
+
+        """
+
+        self._next_check = self.generated + CHECK_NODES
+        if self.cancel is not None and self.cancel.is_set():
+            raise(SearchCancelled("the search was cancelled"))
+        if self.progress is None and self.deadline is None:
+            return
+        now = perf_counter()
+        if self.deadline is not None and now >= self.deadline:
+            raise(SearchTimeout("the search reached its deadline"))
+        if self.progress is not None and \
+           now - self._last_report >= self.interval:
+            self._last_report = now
+            self.progress(self)
+
+    def _close_depth(self, now):
+        if self.depth is not None:
+            self.depth_seconds[self.depth] = \
+                self.depth_seconds.get(self.depth, 0.0) + \
+                now - self._depth_start
+
+    def as_dict(self):
+        """ The statistics as a dictionary that can be stored as JSON """
+
+        return {'generated':        self.generated,
+                'expanded':         self.expanded,
+                'duplicates':       self.duplicates,
+                'depth':            self.depth,
+                'depth_seconds':    {str(depth): seconds for depth, seconds
+                                     in self.depth_seconds.items()},
+                'peak_table_size':  self.peak_table_size,
+                'elapsed':          self.elapsed,
+                'nodes_per_second': self.nodes_per_second}
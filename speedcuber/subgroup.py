@@ -0,0 +1,392 @@
+""" Breadth first enumeration of subgroups, on disk
+
+The states reached from the solved cube with a subset of the moves (a
+subgroup, like <R, U> or <U, D, FF, BB, LL, RR>) are enumerated depth by
+depth, each depth stored in a file instead of in memory, so subgroups of
+hundreds of millions of states can be enumerated with bounded memory:
+
+  * every state is stored as its 16 byte key (see state_keys()), and a
+    depth as a sorted file of keys, without duplicates
+  * the states of a depth are expanded CHUNK_STATES at a time, each chunk
+    giving a sorted run file of its successors
+  * the runs are merged, block by block, into the next depth, dropping
+    duplicates and the states of the previous depths along the way
+    (only the last two when every move's inverse is one of the moves)
+
+A manifest in the directory records the moves, the number of states of
+every depth done and the runs done of the next one, so an interrupted
+enumeration resumes from the last run written.
+
+Once done, the depths are merged into a distance table, the sorted keys
+of every state and their depth, that DistanceTable maps in memory to
+look up how many moves of the subgroup a state is from solved:
+
+    python -m speedcuber.subgroup /tmp/ru --moves R r U u
+
+    table = DistanceTable('/tmp/ru')
+    table.distance(cube.state)
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+import os
+import json
+import argparse
+
+from speedcuber.cube          import Cube
+from speedcuber.compiler      import compile_moves, simplify
+from speedcuber.transposition import state_keys, key_states
+from speedcuber               import tables as table_cache
+
+FORMAT_VERSION = 1
+# States expanded at a time, and keys read from every file at a time
+CHUNK_STATES   = 1 << 16
+BLOCK_KEYS     = 1 << 18
+MANIFEST       = 'manifest.json'
+KEY            = np.dtype('S16')
+
+
+def _level_path(directory, depth):
+    return os.path.join(directory, 'level-%03d.keys' % depth)
+
+def _run_path(directory, depth, run):
+    return os.path.join(directory, 'level-%03d-run-%05d.keys' % (depth, run))
+
+def _keys(filename):
+    """ The keys of a file, mapped in memory """
+
+    if os.path.getsize(filename) == 0:
+        return np.empty(0, dtype=KEY)
+    return np.memmap(filename, dtype=KEY, mode='r')
+
+def _write(filename, parts):
+    """ Writes arrays of keys to a file, atomically """
+
+    temporary = filename + '.tmp'
+    file_handle = open(temporary, 'wb')
+    try:
+        for part in parts:
+            file_handle.write(np.ascontiguousarray(part).data)
+        file_handle.flush()
+        os.fsync(file_handle.fileno())
+    finally:
+        file_handle.close()
+    os.replace(temporary, filename)
+
+def _blocks(arrays, block=BLOCK_KEYS):
+    """ Merges sorted arrays of unique keys, block by block
+
+    Yields the largest key of every block and the keys of every array in
+    it: those up to the smallest of the last keys of the next share of
+    every array, so keys equal in several arrays come out in the same
+    block. A share is an equal part of block keys (at least one key), so
+    a block holds at most block keys (or one key per array, if there are
+    more arrays).
+
+    """
+
+    share     = max(1, block // max(len(arrays), 1))
+    positions = [0] * len(arrays)
+    while True:
+        ends = [array[min(position + share, len(array)) - 1]
+                for array, position in zip(arrays, positions)
+                if position < len(array)]
+        if not ends:
+            return
+        bound = min(ends)
+        parts = []
+        for index, array in enumerate(arrays):
+            end = int(np.searchsorted(array, bound, side='right'))
+            parts.append(array[positions[index]:end])
+            positions[index] = end
+        yield bound, parts
+
+def _without_upto(keys, array, position, bound, block=BLOCK_KEYS):
+    """ The keys that aren't in array, read from position up to bound
+
+    The array is read block keys at a time. Returns the keys left and the
+    position of the first key of array after bound.
+
+    """
+
+    end = int(np.searchsorted(array, bound, side='right'))
+    while position < end:
+        keys = _without(keys, array[position:min(position + block, end)])
+        position += block
+    return keys, end
+
+def _without(keys, sorted_keys):
+    """ The keys (sorted, unique) that aren't in sorted_keys """
+
+    if len(keys) == 0 or len(sorted_keys) == 0:
+        return keys
+    index = np.searchsorted(sorted_keys, keys)
+    found = sorted_keys[np.minimum(index, len(sorted_keys) - 1)] == keys
+    return keys[~found]
+
+
+class Enumeration:
+    """ The enumeration of a subgroup, stored in a directory
+
+    moves are the moves generating the subgroup, each a sequence of
+    motions of Cube.MOTION() ('R', 'u', 'FF'...). They can be left out to
+    resume an enumeration, which are then read from its manifest; given
+    moves must be those of the manifest. chunk_states is the number of
+    states expanded per run, also kept by the manifest.
+
+    """
+
+    def __init__(self, directory, moves=None, chunk_states=CHUNK_STATES):
+        self.directory    = directory
+        manifest = os.path.join(directory, MANIFEST)
+        if os.path.exists(manifest):
+            file_handle = open(manifest, 'r')
+            self.manifest = json.load(file_handle)
+            file_handle.close()
+            if self.manifest.get('format') != FORMAT_VERSION:
+                raise(ValueError("%s is not a subgroup enumeration"
+                                 % directory))
+            if moves is not None and list(moves) != self.manifest['moves']:
+                raise(ValueError("%s enumerates the moves %s"
+                                 % (directory, self.manifest['moves'])))
+        else:
+            if not moves:
+                raise(ValueError("no moves given to enumerate"))
+            for move in moves:
+                simplify(move)
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            self.manifest = {'format': FORMAT_VERSION, 'moves': list(moves),
+                             'chunk_states': chunk_states, 'levels': [],
+                             'runs': 0, 'done': False}
+            _write(_level_path(directory, 0),
+                   [state_keys(Cube().state[None])])
+            self.manifest['levels'].append(1)
+            self._save()
+        self.moves        = self.manifest['moves']
+        # runs already written were cut at the same size
+        self.chunk_states = self.manifest['chunk_states']
+        self.permutations = np.array([compile_moves(move)
+                                      for move in self.moves])
+        # with every inverse among the moves, a state's neighbours are at
+        # most one move closer
+        forward  = set(permutation.tobytes()
+                       for permutation in self.permutations)
+        self.symmetric = all(np.argsort(permutation).tobytes() in forward
+                             for permutation in self.permutations)
+
+    def _save(self):
+        temporary = os.path.join(self.directory, MANIFEST + '.tmp')
+        file_handle = open(temporary, 'w')
+        json.dump(self.manifest, file_handle)
+        file_handle.flush()
+        os.fsync(file_handle.fileno())
+        file_handle.close()
+        os.replace(temporary, os.path.join(self.directory, MANIFEST))
+
+    @property
+    def depth(self):
+        """ The deepest depth enumerated so far """
+
+        return len(self.manifest['levels']) - 1
+
+    @property
+    def done(self):
+        return self.manifest['done']
+
+    def distribution(self):
+        """ The number of states at every depth enumerated so far """
+
+        return list(self.manifest['levels'])
+
+    def level(self, depth):
+        """ The sorted keys of the states at a depth, mapped in memory """
+
+        return _keys(_level_path(self.directory, depth))
+
+    def expand(self):
+        """ Enumerates the next depth, and returns its number of states """
+
+        depth    = self.depth + 1
+        frontier = self.level(depth - 1)
+        runs     = (len(frontier) + self.chunk_states - 1) // \
+                   self.chunk_states
+        for run in range(self.manifest['runs'], runs):
+            chunk  = frontier[run*self.chunk_states:(run+1)*self.chunk_states]
+            states = key_states(chunk)[:, self.permutations]
+            _write(_run_path(self.directory, depth, run),
+                   [np.unique(state_keys(states.reshape(-1, 54)))])
+            self.manifest['runs'] = run + 1
+            self._save()
+        count = self._merge(depth, runs)
+        if count > 0:
+            self.manifest['levels'].append(count)
+        self.manifest['runs'] = 0
+        self.manifest['done'] = count == 0
+        self._save()
+        for run in range(runs):
+            os.remove(_run_path(self.directory, depth, run))
+        if count == 0:
+            os.remove(_level_path(self.directory, depth))
+        return count
+
+    def _merge(self, depth, runs):
+        """ Merges the runs of a depth into its level file """
+
+        first    = max(depth - 2, 0) if self.symmetric == True else 0
+        previous = [self.level(level) for level in range(first, depth)]
+        starts   = [0] * len(previous)
+        counts   = [0]
+
+        def keys():
+            arrays = [_keys(_run_path(self.directory, depth, run))
+                      for run in range(runs)]
+            for bound, parts in _blocks(arrays):
+                block = np.unique(np.concatenate(parts))
+                for index, level in enumerate(previous):
+                    block, starts[index] = _without_upto(block, level,
+                                                         starts[index], bound)
+                counts[0] += len(block)
+                yield block
+
+        _write(_level_path(self.directory, depth), keys())
+        return counts[0]
+
+    def run(self, max_depth=None, progress=None):
+        """ Enumerates depths until none is left (or up to max_depth)
+
+        progress, if given, is called with the depth and its number of
+        states once each depth is done.
+
+        """
+
+        while not self.done and (max_depth is None or
+                                 self.depth < max_depth):
+            count = self.expand()
+            if progress is not None and count > 0:
+                progress(self.depth, count)
+        return self.distribution()
+
+    def table(self, name='distances'):
+        """ Writes the distance table of the depths enumerated
+
+        Its keys and their distances are two tables (see speedcuber.tables)
+        of the directory, name-keys.table and name-distances.table, with
+        the keys sorted.
+
+        """
+
+        levels = [self.level(depth) for depth in range(self.depth + 1)]
+        total  = sum(len(level) for level in levels)
+        keys_file      = os.path.join(self.directory, name + '-keys.tmp')
+        distances_file = os.path.join(self.directory, name + '-distances.tmp')
+        keys      = np.memmap(keys_file, dtype=np.uint8, mode='w+',
+                              shape=(max(total, 1), 16))[:total]
+        distances = np.memmap(distances_file, dtype=np.uint8, mode='w+',
+                              shape=max(total, 1))[:total]
+        position  = 0
+        for _, parts in _blocks(levels):
+            block = np.concatenate(parts)
+            depth = np.concatenate([np.full(len(part), level,
+                                            dtype=np.uint8)
+                                    for level, part in enumerate(parts)])
+            order = np.argsort(block, kind='stable')
+            end   = position + len(block)
+            keys[position:end] = np.frombuffer(block[order].data,
+                                               dtype=np.uint8
+                                               ).reshape(-1, 16)
+            distances[position:end] = depth[order]
+            position = end
+        table_cache.save(table_cache.path(name, 'keys', self.directory),
+                         keys)
+        table_cache.save(table_cache.path(name, 'distances',
+                                          self.directory), distances)
+        del keys, distances
+        os.remove(keys_file)
+        os.remove(distances_file)
+
+
+class DistanceTable:
+    """ Distances from solved of the states of a subgroup
+
+    Loaded from the tables Enumeration.table() writes in directory.
+
+    """
+
+    def __init__(self, directory, name='distances'):
+        self.keys      = table_cache.load(table_cache.path(name, 'keys',
+                                                           directory)
+                                          ).view(KEY).ravel()
+        self.distances = table_cache.load(table_cache.path(name,
+                                                           'distances',
+                                                           directory))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def distances_of(self, states):
+        """ The distance of every state of an (N, 54) array
+
+        States outside the subgroup are given -1. The colours of every
+        state are taken from its centres.
+
+        """
+
+        states  = np.asarray(states, dtype=np.uint8).reshape(-1, 54)
+        # every colour renamed after the side of its centre
+        sides   = np.zeros((len(states), 256), dtype=np.uint8)
+        sides[np.arange(len(states))[:, None], states[:, 4::9]] = \
+            np.arange(6, dtype=np.uint8)
+        keys    = state_keys(np.take_along_axis(sides, states, axis=1))
+        index   = np.minimum(np.searchsorted(self.keys, keys),
+                             max(len(self.keys) - 1, 0))
+        found   = self.keys[index] == keys
+        return np.where(found, self.distances[index].astype(int), -1)
+
+    def distance(self, state):
+        """ The number of moves of the subgroup a state is from solved
+
+        None if the state isn't in the subgroup.
+
+        """
+
+        distance = int(self.distances_of(state)[0])
+        return None if distance < 0 else distance
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m speedcuber.subgroup",
+        description="Enumerates the states of a subgroup on disk, and "
+                    "writes their distance table.")
+    parser.add_argument("directory",
+                        help="directory of the enumeration (resumed if it "
+                             "has one already)")
+    parser.add_argument("--moves", nargs="+", default=None,
+                        help="moves generating the subgroup (eg: R r U u, "
+                             "or U u D d FF BB LL RR)")
+    parser.add_argument("--max-depth", type=int, default=None,
+                        help="stop after this depth")
+    parser.add_argument("--chunk", type=int, default=CHUNK_STATES,
+                        help="states expanded at a time (default: %d)"
+                             % CHUNK_STATES)
+    arguments = parser.parse_args(arguments)
+
+    enumeration = Enumeration(arguments.directory, arguments.moves,
+                              arguments.chunk)
+
+    def progress(depth, count):
+        print("depth %d: %d states" % (depth, count), flush=True)
+
+    for depth, count in enumerate(enumeration.distribution()):
+        print("depth %d: %d states" % (depth, count))
+    enumeration.run(arguments.max_depth, progress)
+    enumeration.table()
+    print("%d states" % sum(enumeration.distribution()))
+
+
+if __name__ == "__main__":
+    main()
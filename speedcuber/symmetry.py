@@ -0,0 +1,161 @@
+""" The 48 symmetries of the cube, and canonical representatives of states
+
+A symmetry is a rotation of the whole cube (24 of them), possibly
+followed by a reflection in a mirror (24 more). Applied to a state, it
+moves every sticker where the symmetry takes it, then recolours it so
+the centres keep their colours: the symmetric state of a scrambled cube
+is as far from solved as the cube itself, and solved by the symmetric
+moves (see transform_moves()).
+
+Every state has a canonical representative, the smallest of its (up to)
+48 symmetric states. States with the same representative are solved by
+the same number of moves, so searches and caches can key on it to store
+and expand up to 48 times fewer states.
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+from itertools import permutations, product
+
+from speedcuber.cube          import FACES, MOVES
+from speedcuber.transposition import state_key
+
+# Every sticker as a point in space: x to the right, y up and z towards
+# the front of the cube, at twice its cubie position plus the normal of
+# its side. Each side is given by its normal and the points of its rows
+# and columns, as the side is written looking towards it.
+_SIDES = {'up':    ((0, 1, 0),  lambda r, c: (c - 1, 1, r - 1)),
+          'left':  ((-1, 0, 0), lambda r, c: (-1, 1 - r, c - 1)),
+          'front': ((0, 0, 1),  lambda r, c: (c - 1, 1 - r, 1)),
+          'right': ((1, 0, 0),  lambda r, c: (1, 1 - r, 1 - c)),
+          'back':  ((0, 0, -1), lambda r, c: (1 - c, 1 - r, -1)),
+          'down':  ((0, -1, 0), lambda r, c: (c - 1, -1, 1 - r))}
+
+
+def _points():
+    points = []
+    for face in FACES:
+        normal, position = _SIDES[face]
+        for row in range(3):
+            for column in range(3):
+                points.append(2 * np.array(position(row, column)) +
+                              np.array(normal))
+    return np.array(points)
+
+def _matrices():
+    """ The 48 signed permutation matrices, rotations first """
+
+    matrices = []
+    for axes in permutations(range(3)):
+        for signs in product((1, -1), repeat=3):
+            matrix = np.zeros((3, 3), dtype=int)
+            matrix[range(3), axes] = signs
+            matrices.append(matrix)
+    matrices.sort(key=lambda matrix: -round(np.linalg.det(matrix)))
+    # the identity first
+    matrices.sort(key=lambda matrix: not (matrix == np.eye(3)).all())
+    return matrices
+
+def _build():
+    points  = _points()
+    index   = {tuple(point): i for i, point in enumerate(points)}
+    gathers = []
+    for matrix in _matrices():
+        # the sticker at point p moves to matrix @ p, so the symmetric
+        # state reads each point from where the symmetry brought it from
+        moved = [index[tuple(matrix @ point)] for point in points]
+        gathers.append(np.argsort(moved))
+    gathers = np.array(gathers)
+    # where each centre is brought to
+    sides   = np.argsort(gathers, axis=1)[:, 4::9] // 9
+    return gathers, sides
+
+# SYMMETRIES[k] gathers the stickers of the k-th symmetric state (before
+# recolouring), SIDES[k][f] is the side the k-th symmetry takes side f to
+SYMMETRIES, SIDES = _build()
+SYMMETRIES.setflags(write=False)
+SIDES.setflags(write=False)
+# The first 24 symmetries are rotations, the last 24 reflections
+ROTATIONS = 24
+
+
+def _build_inverses():
+    inverses = []
+    for gather in SYMMETRIES:
+        inverse = np.argsort(gather)
+        inverses.append(next(k for k, other in enumerate(SYMMETRIES)
+                             if (other == inverse).all()))
+    return np.array(inverses)
+
+def _build_move_maps():
+    """ For every symmetry, the move each move becomes """
+
+    maps = []
+    for gather in SYMMETRIES:
+        inverse = np.argsort(gather)
+        conjugates = dict()
+        for letter, move in MOVES.items():
+            conjugate = inverse[move[gather]]
+            conjugates[letter] = next(other
+                                      for other, permutation in MOVES.items()
+                                      if (permutation == conjugate).all())
+        maps.append(conjugates)
+    return maps
+
+INVERSES  = _build_inverses()
+MOVE_MAPS = _build_move_maps()
+# Offset of the colours of every symmetry in a flat (48, 6) array
+_COLOUR_ROWS = (np.arange(len(SYMMETRIES)) * 6)[:, None]
+
+
+def symmetric(state, symmetry):
+    """ The state seen through a symmetry (an index of SYMMETRIES) """
+
+    state   = np.asarray(state)
+    centres = state[4::9]
+    colours = np.empty(6, dtype=state.dtype)
+    colours[centres] = centres[SIDES[symmetry]]
+    return colours[state[SYMMETRIES[symmetry]]]
+
+def canonical(state):
+    """ The canonical representative of a state, and its symmetry
+
+    Returns the smallest of the 48 symmetric states (compared sticker by
+    sticker) and the index of the symmetry giving it, so that
+    symmetric(state, symmetry) is the representative.
+
+    """
+
+    state   = np.asarray(state, dtype=np.uint8)
+    centres = state[4::9]
+    colours = np.empty((len(SYMMETRIES), 6), dtype=np.uint8)
+    colours[:, centres] = centres[SIDES]
+    states  = colours.ravel()[state[SYMMETRIES] + _COLOUR_ROWS]
+    # compared as byte strings (trailing zeros are dropped, which doesn't
+    # change the order as zero is the smallest byte)
+    symmetry = int(np.argmin(states.view('S54').ravel()))
+    return states[symmetry], symmetry
+
+def canonical_key(state):
+    """ state_key() of the canonical representative of a state """
+
+    return state_key(canonical(state)[0])
+
+def transform_moves(moves, symmetry):
+    """ The moves seen through a symmetry
+
+    If moves take a state to another, transform_moves(moves, symmetry)
+    takes their symmetric states to each other. So the moves solving the
+    canonical representative of a state solve the state itself once
+    transformed by the inverse symmetry:
+
+        representative, symmetry = canonical(cube.state)
+        solution = transform_moves(moves, INVERSES[symmetry])
+
+    """
+
+    move_map = MOVE_MAPS[symmetry]
+    return ''.join(move_map[move] for move in moves)
@@ -0,0 +1,174 @@
+""" Cache of precomputed tables on disk
+
+The solvers need move tables and pruning tables that take seconds to
+minutes to compute. They are built the first time a solver needs them
+and stored in TABLES_DIRECTORY, one file per table:
+
+  * a header: magic bytes, format version, version of the table (bumped
+    by the code building it when its content changes), CRC-32 of the
+    data, numpy dtype and shape
+  * the raw array, from byte DATA_OFFSET
+
+Files are written aside and renamed, so processes reading them never see
+a partial table, and read through mmap, so every process shares the same
+pages of memory. The first time a process loads a file, its header, size
+and checksum are checked (which reads it whole, once), and a file with a
+wrong one is built again.
+
+Processes building the same tables at once take a lock on a file of
+their group (with fcntl, where there is one), so only the first one
+builds them and the others load what it saved.
+
+Nothing is read until a solver asks for its tables, so importing
+speedcuber stays fast.
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+import os
+import mmap
+import zlib
+import struct
+try:
+    import fcntl
+except(ImportError):
+    # no locking, processes building the same tables at once all do so
+    fcntl = None
+
+# The directory where tables are stored unless told otherwise
+TABLES_DIRECTORY = os.environ.get('SPEEDCUBER_TABLES',
+                   os.path.join(os.path.expanduser('~'), '.cache',
+                                'speedcuber'))
+
+FORMAT_VERSION  = 1
+DATA_OFFSET     = 64
+_MAGIC          = b'SCTBL'
+# magic, format version, table version, crc32, dtype, dimensions, shape
+_HEADER         = struct.Struct('<5sBHI8sB4Q')
+_MAX_DIMENSIONS = 4
+
+# Tables already loaded by this process, by file name
+_loaded = dict()
+
+
+def path(group, name, directory=None):
+    """ File name of a table """
+
+    return os.path.join(directory or TABLES_DIRECTORY,
+                        '%s-%s.table' % (group, name))
+
+def save(filename, array, version=0):
+    """ Writes an array as a table file, atomically """
+
+    array = np.ascontiguousarray(array)
+    if array.ndim > _MAX_DIMENSIONS:
+        raise(ValueError("tables have at most %d dimensions"
+                         % _MAX_DIMENSIONS))
+    shape  = array.shape + (0,) * (_MAX_DIMENSIONS - array.ndim)
+    header = _HEADER.pack(_MAGIC, FORMAT_VERSION, version,
+                          zlib.crc32(array.data) & 0xffffffff,
+                          array.dtype.str.encode('ascii'), array.ndim,
+                          *shape)
+    directory = os.path.dirname(filename)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory, exist_ok=True)
+    temporary = filename + '.%d.tmp' % os.getpid()
+    file_handle = open(temporary, 'wb')
+    try:
+        file_handle.write(header.ljust(DATA_OFFSET, b'\0'))
+        file_handle.write(array.data)
+        file_handle.flush()
+        os.fsync(file_handle.fileno())
+    finally:
+        file_handle.close()
+    os.replace(temporary, filename)
+
+def load(filename, version=0, verify=True):
+    """ Maps a table file in memory
+
+    Returns a read-only array backed by the pages of the file. ValueError
+    is raised if the file isn't a valid table of that version or hasn't
+    its size, or, if verify, if its checksum doesn't match (which reads
+    the whole file).
+
+    """
+
+    file_handle = open(filename, 'rb')
+    try:
+        if os.fstat(file_handle.fileno()).st_size < DATA_OFFSET:
+            raise(ValueError("%s is not a valid table" % filename))
+        mapped = mmap.mmap(file_handle.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        file_handle.close()
+    header = _HEADER.unpack_from(mapped)
+    magic, format_version, table_version, checksum, dtype, dimensions = \
+        header[:6]
+    shape  = header[6:6+dimensions]
+    if magic != _MAGIC or format_version != FORMAT_VERSION or \
+       table_version != version:
+        raise(ValueError("%s is not a valid table (version %d)"
+                         % (filename, version)))
+    dtype = np.dtype(dtype.rstrip(b'\0').decode('ascii'))
+    size  = int(np.prod(shape)) * dtype.itemsize
+    if len(mapped) != DATA_OFFSET + size:
+        raise(ValueError("%s is truncated" % filename))
+    data = memoryview(mapped)[DATA_OFFSET:]
+    if verify == True and zlib.crc32(data) & 0xffffffff != checksum:
+        raise(ValueError("%s is corrupted" % filename))
+    return np.frombuffer(data, dtype=dtype).reshape(shape)
+
+def _load_all(filenames, version):
+    """ The tables of a group loaded, ValueError or OSError if one can't be
+
+    Every file is verified the first time this process loads it.
+
+    """
+
+    tables = dict()
+    for name, filename in filenames.items():
+        if filename not in _loaded:
+            _loaded[filename] = load(filename, version, verify=True)
+        tables[name] = _loaded[filename]
+    return tables
+
+def cached(group, names, build, version=0, directory=None):
+    """ Tables of a group, built and stored first if needed
+
+    names are the tables of the group, which build() returns all at once
+    as a dictionary of arrays. Returns a dictionary of the read-only
+    arrays, loaded once per process.
+
+    The tables are built holding the lock of the group, and only if they
+    still can't be loaded once it is taken, as another process may have
+    built them meanwhile.
+
+    """
+
+    filenames = dict((name, path(group, name, directory)) for name in names)
+    try:
+        return _load_all(filenames, version)
+    except(OSError, ValueError):
+        pass
+    lockname = os.path.join(directory or TABLES_DIRECTORY, '%s.lock' % group)
+    if not os.path.isdir(os.path.dirname(lockname)):
+        os.makedirs(os.path.dirname(lockname), exist_ok=True)
+    lock_handle = open(lockname, 'a')
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_handle.fileno(), fcntl.LOCK_EX)
+        try:
+            return _load_all(filenames, version)
+        except(OSError, ValueError):
+            pass
+        built = build()
+        for name, filename in filenames.items():
+            save(filename, built[name], version)
+            # the file loaded before, if any, is replaced
+            _loaded.pop(filename, None)
+        return _load_all(filenames, version)
+    finally:
+        # closing the file releases the lock
+        lock_handle.close()
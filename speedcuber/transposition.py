@@ -0,0 +1,171 @@
+""" Transposition table: the states a search has already reached
+
+Different sequences of motions often reach the same state (eg: 'FB' and
+'BF'). A transposition table remembers every state reached, keyed by a
+compact encoding of its stickers, with the depth it was first reached
+at, so a search can skip any state it has already expanded.
+
+Any key can be used: state_key() tells every state apart, while
+speedcuber.symmetry.canonical_key() gives the same key to the (up to 48)
+states symmetric to each other, which are as far from solved. The latter
+pays off for tables of states reached from the solved cube, where
+symmetric states abound, but rarely from a scrambled one.
+
+Its size can be capped. Once full, an entry is evicted for every new
+one, either the least recently used one ('lru') or one of the deepest
+ones ('depth': shallow states prune the largest parts of a search, so
+they are kept).
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+from collections import OrderedDict
+
+POLICIES = ('lru', 'depth')
+
+# Every sticker but the centres, which no motion moves, by groups of three
+# packed into one byte as base 6 digits
+_STICKERS = np.array([i for i in range(54) if i % 9 != 4]).reshape(16, 3)
+_DIGITS   = np.array([36, 6, 1], dtype=np.uint8)
+
+
+def state_key(state):
+    """ Compact key of a Cube state: 3 stickers per byte, 16 bytes
+
+    Centres are left out, so only states of a same search (which share
+    their centres) should be compared.
+
+    """
+
+    return (np.asarray(state, dtype=np.uint8)[_STICKERS] @ _DIGITS).tobytes()
+
+def state_keys(states):
+    """ state_key() of every state of an (N, 54) array
+
+    Returns an (N,) array of 16 byte strings, which sort like the keys.
+
+    """
+
+    states = np.asarray(states, dtype=np.uint8)
+    keys   = states[:, _STICKERS] @ _DIGITS
+    return np.ascontiguousarray(keys).view('S16').ravel()
+
+def key_states(keys, centres=None):
+    """ The states of an array of keys (see state_keys())
+
+    Keys leave the centres out: they are given by centres, the colour of
+    the centre of every side (those of Cube() by default).
+
+    """
+
+    if centres is None:
+        centres = np.arange(6, dtype=np.uint8)
+    keys   = np.frombuffer(np.ascontiguousarray(keys).data, dtype=np.uint8
+                           ).reshape(-1, len(_STICKERS))
+    states = np.empty((len(keys), 54), dtype=np.uint8)
+    states[:, 4::9] = centres
+    states[:, _STICKERS] = keys[:, :, None] // _DIGITS % 6
+    return states
+
+
+class TranspositionTable:
+    """ States reached by a search, with their depth
+
+    max_entries caps the number of states kept (None for no cap): each
+    entry takes about 150 bytes. policy chooses the entry evicted when
+    the table is full, 'lru' or 'depth' (see the module documentation).
+
+    hits, misses and evictions count what happened to the lookups and
+    stores.
+
+    """
+
+    def __init__(self, max_entries=None, policy='lru'):
+        if policy not in POLICIES:
+            raise(ValueError("unknown eviction policy %r" % (policy,)))
+        self.max_entries = max_entries
+        self.policy      = policy
+        self.entries     = OrderedDict()
+        # for 'depth': the keys of every depth, oldest first
+        self.depths      = dict()
+        self.hits        = 0
+        self.misses      = 0
+        self.evictions   = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def lookup(self, key):
+        """ The depth a state was reached at, or None if it wasn't """
+
+        depth = self.entries.get(key)
+        if depth is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.policy == 'lru':
+            self.entries.move_to_end(key)
+        return depth
+
+    def store(self, key, depth):
+        """ Records that a state was reached at depth
+
+        A state reached again deeper keeps its shallowest depth.
+
+        """
+
+        previous = self.entries.get(key)
+        if previous is not None and previous <= depth:
+            return
+        self.entries[key] = depth
+        if self.policy == 'lru':
+            self.entries.move_to_end(key)
+        else:
+            if previous is not None:
+                del self.depths[previous][key]
+            self.depths.setdefault(depth, dict())[key] = None
+        if self.max_entries is not None and \
+           len(self.entries) > self.max_entries:
+            self._evict()
+
+    def _evict(self):
+        if self.policy == 'lru':
+            self.entries.popitem(last=False)
+        else:
+            deepest = max(depth for depth in self.depths
+                          if len(self.depths[depth]) > 0)
+            key = next(iter(self.depths[deepest]))
+            del self.depths[deepest][key]
+            del self.entries[key]
+        self.evictions += 1
+
+    def arrays(self):
+        """ The keys and depths of every state, oldest first
+
+        Returns an (N, 16) array of keys (see state_key()) and an array of
+        their depths, to store the table compactly.
+
+        """
+
+        keys   = np.frombuffer(b''.join(self.entries.keys()), dtype=np.uint8)
+        depths = np.fromiter(self.entries.values(), dtype=np.uint8,
+                             count=len(self.entries))
+        return keys.reshape(-1, 16), depths
+
+    def restore(self, keys, depths):
+        """ Stores the states of arrays() back, in the same order """
+
+        for key, depth in zip(np.asarray(keys, dtype=np.uint8), depths):
+            self.store(key.tobytes(), int(depth))
+
+    def clear(self):
+        """ Forgets every state """
+
+        self.entries.clear()
+        self.depths.clear()
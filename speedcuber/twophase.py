@@ -0,0 +1,455 @@
+""" Two-phase solver (Kociemba's algorithm)
+
+Phase 1 brings the cube, with any move, into the subgroup where every
+corner and edge is oriented and the 4 middle layer edges (FR, FL, BL,
+BR) are in the middle layer. Phase 2 then solves it using only the
+moves that keep it in that subgroup: 'U', 'u', 'D', 'd' and the half
+turns 'UU', 'DD', 'FF', 'RR', 'LL' and 'BB'.
+
+Both phases count a half turn as one move (it is written as two
+motions of the same side in the solution), which is the metric the
+algorithm is designed for: random cubes take about 20 to 24 moves.
+
+Both phases are IDA* searches on small coordinates of the cubies, with
+precomputed move tables and pruning tables (exact distances of pairs of
+coordinates), so a solution is found in a fraction of a second. It is not
+the shortest one: phase 1 solutions of increasing length are tried until
+the total is short enough.
+
+Phase 1 coordinates:  twist of the corners (2187), flip of the edges
+                      (2048) and positions of the middle edges (495)
+Phase 2 coordinates:  permutation of the corners (40320), of the 8 up and
+                      down edges (40320) and of the middle edges (24)
+
+"""
+
+# External dependancy
+import numpy as np
+
+# From Python Standard Library
+from itertools import combinations
+from time      import monotonic
+
+from speedcuber.cube    import OPPOSITE
+from speedcuber.cubie   import MOVE_CUBIES, from_state, multiply, \
+                               rank_permutations, unrank_permutations, \
+                               twist, untwist, flip, unflip
+from speedcuber.pattern import breadth_first
+from speedcuber         import tables as table_cache
+from speedcuber.stats   import SearchStats
+
+TWISTS       = 2187
+FLIPS        = 2048
+SLICES       = 495                      # 12 choose 4
+PERMUTATIONS = 40320                    # 8!
+SLICE_PERMS  = 24                       # 4!
+
+PHASE1_MOVES = ['U', 'u', 'UU', 'D', 'd', 'DD', 'R', 'r', 'RR',
+                'L', 'l', 'LL', 'F', 'f', 'FF', 'B', 'b', 'BB']
+PHASE2_MOVES = ['U', 'u', 'UU', 'D', 'd', 'DD', 'RR', 'LL', 'FF', 'BB']
+# The middle layer edges
+SLICE_EDGES  = (8, 9, 10, 11)
+# Longest phase 2 tried after a phase 1 solution: a longer phase 1
+# solution with a short phase 2 is found sooner than a long phase 2
+MAX_PHASE2   = 12
+# Any cube of the phase 2 subgroup is solved within 18 phase 2 moves
+PHASE2_DEPTH = 18
+
+def _successors(moves):
+    """ Moves allowed after a move of each side ('' for none)
+
+    A move never follows a move of the same side, nor of the opposite
+    side when it comes first in moves (both commute).
+
+    """
+
+    faces = [move[0].upper() for move in moves]
+    successors = dict()
+    for last in [''] + faces:
+        successors[last] = [move for move, face in enumerate(faces)
+                            if face != last and
+                               not (OPPOSITE[face] == last and
+                                    faces.index(face) < faces.index(last))]
+    return successors
+
+PHASE1_SUCCESSORS = _successors(PHASE1_MOVES)
+PHASE2_SUCCESSORS = _successors(PHASE2_MOVES)
+# Phase 1 can only end with a quarter turn of the sides phase 2 half turns:
+# any other last move keeps the cube in the phase 2 subgroup, so the
+# phase 1 solution without it was already tried.
+PHASE1_ENDS = [move in ('R', 'r', 'L', 'l', 'F', 'f', 'B', 'b')
+               for move in PHASE1_MOVES]
+
+# Rank of every set of 4 edge positions, by its bitmask
+_COMBINATIONS = list(combinations(range(12), 4))
+_SLICE_RANK   = np.zeros(1 << 12, dtype=np.int64)
+for _rank, _positions in enumerate(_COMBINATIONS):
+    _SLICE_RANK[sum(1 << position for position in _positions)] = _rank
+_SLICE_OCCUPANCY = np.array([[position in positions for position in range(12)]
+                             for positions in _COMBINATIONS])
+SOLVED_SLICE = int(_SLICE_RANK[sum(1 << edge for edge in SLICE_EDGES)])
+
+
+def _cubies(move):
+    """ Cubies of a phase 1 or phase 2 move (a sequence of motions) """
+
+    cubies = MOVE_CUBIES[move[0]]
+    for motion in move[1:]:
+        cubies = multiply(cubies, MOVE_CUBIES[motion])
+    return cubies
+
+def _merge(first, second):
+    """ The single move turning a side as much as two moves of that side """
+
+    turns = (first.count(first[0].upper()) + 3 * first.count(first[0].lower())
+             + second.count(second[0].upper())
+             + 3 * second.count(second[0].lower())) % 4
+    return ['', first[0].upper(), first[0].upper() * 2,
+            first[0].lower()][turns]
+
+PHASE1_CUBIES = [_cubies(move) for move in PHASE1_MOVES]
+PHASE2_CUBIES = [_cubies(move) for move in PHASE2_MOVES]
+
+def slice_coordinate(ep):
+    """ Coordinate (0 to 494) of the positions of the middle edges """
+
+    occupied = np.isin(np.asarray(ep), SLICE_EDGES)
+    return _SLICE_RANK[(occupied << np.arange(12)).sum(axis=-1)]
+
+def coordinates(cp, co, ep, eo):
+    """ Phase 1 coordinates of cubies: (twist, flip, slice) """
+
+    return int(twist(co)), int(flip(eo)), int(slice_coordinate(ep))
+
+def phase2_coordinates(cp, ep):
+    """ Phase 2 coordinates of cubies in the phase 2 subgroup """
+
+    return int(rank_permutations(cp)), int(rank_permutations(ep[:8])), \
+           int(rank_permutations(np.asarray(ep[8:]) - 8))
+
+
+def move_tables():
+    """ Coordinate move tables of both phases
+
+    Returns a dictionary of 2D arrays indexed by [coordinate, move]: the
+    phase 1 tables ('twist', 'flip', 'slice') for PHASE1_MOVES and the
+    phase 2 tables ('corners', 'edges', 'slice_perm') for PHASE2_MOVES.
+
+    """
+
+    tables = dict()
+    phase1 = PHASE1_CUBIES
+    move_cp = np.array([cubies[0] for cubies in phase1])
+    move_co = np.array([cubies[1] for cubies in phase1])
+    move_ep = np.array([cubies[2] for cubies in phase1])
+    move_eo = np.array([cubies[3] for cubies in phase1])
+
+    co = untwist(np.arange(TWISTS))
+    tables['twist'] = twist((co[:, move_cp] + move_co) % 3)
+    eo = unflip(np.arange(FLIPS))
+    tables['flip']  = flip((eo[:, move_ep] + move_eo) % 2)
+    occupied = _SLICE_OCCUPANCY[:, move_ep]
+    tables['slice'] = _SLICE_RANK[(occupied << np.arange(12)).sum(axis=-1)]
+
+    phase2  = PHASE2_CUBIES
+    move_cp = np.array([cubies[0] for cubies in phase2])
+    move_ep = np.array([cubies[2] for cubies in phase2])
+    cp = unrank_permutations(np.arange(PERMUTATIONS), 8)
+    tables['corners']    = rank_permutations(cp[:, move_cp])
+    tables['edges']      = rank_permutations(cp[:, move_ep[:, :8]])
+    sp = unrank_permutations(np.arange(SLICE_PERMS), 4)
+    tables['slice_perm'] = rank_permutations(sp[:, move_ep[:, 8:] - 8])
+
+    for name in tables:
+        tables[name] = tables[name].astype(np.uint16)
+    return tables
+
+MOVE_TABLES    = ('twist', 'flip', 'slice', 'corners', 'edges', 'slice_perm')
+PRUNING_TABLES = ('twist_slice', 'flip_slice', 'corners_slice',
+                  'edges_slice')
+# Version of the stored tables, to bump when their content changes
+VERSION        = 1
+
+def pruning_tables(tables):
+    """ Distances to the goal of each phase of pairs of coordinates
+
+    'twist_slice' and 'flip_slice' are indexed by coordinate * 495 +
+    slice, 'corners_slice' and 'edges_slice' by coordinate * 24 +
+    slice_perm.
+
+    """
+
+    pruning = dict()
+    for name, other, size in (('twist', 'slice', SLICES),
+                              ('flip', 'slice', SLICES),
+                              ('corners', 'slice_perm', SLICE_PERMS),
+                              ('edges', 'slice_perm', SLICE_PERMS)):
+        first  = tables[name].astype(np.int64)
+        second = tables[other].astype(np.int64)
+
+        def neighbours(states, first=first, second=second, size=size):
+            return first[states // size] * size + second[states % size]
+
+        start = SOLVED_SLICE if size == SLICES else 0
+        pruning[name + '_slice'] = \
+            breadth_first(len(first) * size, start, neighbours)
+    return pruning
+
+_tables = dict()
+
+def tables():
+    """ Move and pruning tables, read once per process
+
+    They are built the first time (a few seconds) and then read from the
+    table cache (see speedcuber.tables). Every table is returned as a
+    memoryview of a flat array, which the searches read much faster than
+    numpy arrays.
+
+    """
+
+    if not _tables:
+        moves   = table_cache.cached('twophase', MOVE_TABLES, move_tables,
+                                     VERSION)
+        pruning = table_cache.cached('twophase', PRUNING_TABLES,
+                                     lambda: pruning_tables(moves), VERSION)
+        for name, table in list(moves.items()) + list(pruning.items()):
+            _tables[name] = memoryview(table.ravel())
+    return _tables
+
+
+class _Search:
+    """ The state of one two-phase search """
+
+    def __init__(self, cube, max_length, timeout, stats, bound=None,
+                 max_nodes=None):
+        self.tables      = tables()
+        self.cubies      = from_state(cube.state)
+        self.max_length  = max_length
+        self.deadline    = None if timeout is None else monotonic() + timeout
+        # only solutions shorter than bound are looked for, if given, and
+        # then the search may end without any
+        self.bound       = bound
+        self.max_nodes   = max_nodes
+        self.best        = None
+        self.best_length = None
+        self.nodes       = 0
+        self.stopped     = False
+        self.path        = []
+        self.stats       = stats
+
+    def done(self):
+        """ True once the search can stop """
+
+        if self.best is None and self.bound is None:
+            return False
+        if self.best is not None and \
+           (self.max_length is None or self.best_length <= self.max_length):
+            return True
+        if self.max_nodes is not None and self.nodes >= self.max_nodes:
+            return True
+        return self.deadline is not None and monotonic() > self.deadline
+
+    def run(self, twist, flip, slice):
+        """ Phase 1 solutions of increasing length, until done()
+
+        With a bound, it also ends once phase 1 alone is as long as it.
+
+        """
+
+        t = self.tables
+        depth = max(t['twist_slice'][twist * SLICES + slice],
+                    t['flip_slice'][flip * SLICES + slice])
+        while not self.done() and (self.bound is None or depth < self.bound):
+            self.stats.enter_depth(depth)
+            self.phase1(twist, flip, slice, depth, '')
+            depth += 1
+
+    def phase1(self, twist, flip, slice, remaining, last_face):
+        """ Depth first search of phase 1 solutions of remaining moves """
+
+        t = self.tables
+        twist_moves, flip_moves, slice_moves = t['twist'], t['flip'], \
+                                               t['slice']
+        twist_slice, flip_slice = t['twist_slice'], t['flip_slice']
+        successors = PHASE1_SUCCESSORS[last_face]
+        self.stats.expand(1, len(successors))
+        for move in successors:
+            self.nodes += 1
+            if (self.nodes & 1023) == 0:
+                self.stopped = self.done()
+            if self.stopped == True:
+                return
+            nt = twist_moves[twist * 18 + move]
+            nf = flip_moves[flip * 18 + move]
+            ns = slice_moves[slice * 18 + move]
+            h  = max(twist_slice[nt * SLICES + ns], flip_slice[nf * SLICES + ns])
+            if h >= remaining:
+                continue
+            self.path.append(move)
+            if remaining > 1:
+                self.phase1(nt, nf, ns, remaining - 1,
+                            PHASE1_MOVES[move][0].upper())
+            elif PHASE1_ENDS[move] == True:
+                self.phase2()
+            self.path.pop()
+            if self.stopped == True:
+                return
+
+    def phase2(self):
+        """ Solves the cube reached by self.path with phase 2 moves """
+
+        cubies = self.cubies
+        for move in self.path:
+            cubies = multiply(cubies, PHASE1_CUBIES[move])
+        corners, edges, slice_perm = phase2_coordinates(cubies[0], cubies[2])
+        shortest = self.best_length if self.best is not None else self.bound
+        if shortest is None:
+            limit = MAX_PHASE2
+        else:
+            limit = min(shortest - len(self.path), MAX_PHASE2)
+        # phase 2 may start turning the side phase 1 ended with, both moves
+        # are then merged into one
+        found = self.phase2_search(corners, edges, slice_perm, limit, '')
+        if found is not None:
+            moves = [PHASE1_MOVES[move] for move in self.path] + \
+                    [PHASE2_MOVES[move] for move in found]
+            if found and moves[len(self.path)][0].upper() == \
+                         moves[len(self.path)-1][0].upper():
+                moves[len(self.path)-1:len(self.path)+1] = \
+                    [_merge(moves[len(self.path)-1], moves[len(self.path)])]
+            if shortest is None or len(moves) < shortest:
+                self.best        = ''.join(moves)
+                self.best_length = len(moves)
+        self.stopped = self.done()
+
+    def phase2_search(self, corners, edges, slice_perm, limit, last_face):
+        """ Shortest phase 2 solution (move indices) of at most limit moves
+
+        Returns None if there isn't any.
+
+        """
+
+        t = self.tables
+        depth = max(t['corners_slice'][corners * SLICE_PERMS + slice_perm],
+                    t['edges_slice'][edges * SLICE_PERMS + slice_perm])
+        while depth <= limit:
+            moves = []
+            if self._phase2(corners, edges, slice_perm, depth, last_face,
+                            moves) == True:
+                return moves
+            if self.stopped == True:
+                return None
+            depth += 1
+        return None
+
+    def _phase2(self, corners, edges, slice_perm, remaining, last_face, moves):
+        """ Depth first search of phase 2 solutions of remaining moves """
+
+        if remaining == 0:
+            return corners == 0 and edges == 0 and slice_perm == 0
+        t = self.tables
+        corner_moves, edge_moves = t['corners'], t['edges']
+        slice_moves = t['slice_perm']
+        corners_slice, edges_slice = t['corners_slice'], t['edges_slice']
+        successors = PHASE2_SUCCESSORS[last_face]
+        self.stats.expand(1, len(successors))
+        for move in successors:
+            self.nodes += 1
+            if (self.nodes & 1023) == 0:
+                self.stopped = self.done()
+            if self.stopped == True:
+                return False
+            nc = corner_moves[corners * 10 + move]
+            ne = edge_moves[edges * 10 + move]
+            ns = slice_moves[slice_perm * 10 + move]
+            h  = max(corners_slice[nc * SLICE_PERMS + ns],
+                     edges_slice[ne * SLICE_PERMS + ns])
+            if h >= remaining:
+                continue
+            moves.append(move)
+            if self._phase2(nc, ne, ns, remaining - 1,
+                            PHASE2_MOVES[move][0].upper(), moves) == True:
+                return True
+            moves.pop()
+        return False
+
+
+def solve_twophase(cube, max_length=None, timeout=None, stats=None):
+    """ Solves the Cube with the two-phase algorithm
+
+    Without max_length, the first solution found is returned (usually
+    about 21 moves, within a fraction of a second). Otherwise longer
+    phase 1 solutions keep being tried until a solution of at most
+    max_length moves (a half turn counting as one) is found, or until
+    timeout seconds have passed (the best solution found by then is
+    returned).
+
+    Returns the moves and the number of nodes visited. The depths of
+    stats are the lengths of the phase 1 solutions tried.
+
+    """
+
+    stats  = stats if stats is not None else SearchStats()
+    cubies = from_state(cube.state)
+    twist, flip, slice = coordinates(*cubies)
+    search = _Search(cube, max_length, timeout, stats)
+    stats.begin()
+    if twist == 0 and flip == 0 and slice == SOLVED_SLICE:
+        # already in the phase 2 subgroup
+        stats.enter_depth(0)
+        corners, edges, slice_perm = phase2_coordinates(cubies[0], cubies[2])
+        found = search.phase2_search(corners, edges, slice_perm,
+                                     PHASE2_DEPTH, '')
+        if found is not None:
+            stats.finish()
+            return ''.join(PHASE2_MOVES[move] for move in found), search.nodes
+
+    search.run(twist, flip, slice)
+    stats.finish()
+    return search.best, search.nodes
+
+def solution_length(moves):
+    """ Number of moves of a solution, a half turn ('UU') counting as one """
+
+    return len(moves) - sum(1 for first, second in zip(moves, moves[1:])
+                            if first == second)
+
+def solve_anytime(cube, timeout=None, max_nodes=None, stats=None):
+    """ Solutions of the Cube, each shorter than the previous one
+
+    A generator: the first solution is the one solve_twophase() returns,
+    found within a fraction of a second, whatever the budget. Then the
+    search starts again looking only for solutions shorter than the best
+    one, and yields every one it finds, until timeout seconds have passed
+    or max_nodes nodes have been visited (in all), or until no shorter
+    solution can be found. The last solution yielded is the best one:
+
+        for moves, nodes in solve_anytime(cube, timeout=1):
+            best = moves
+
+    Yields the moves and the number of nodes visited so far.
+
+    """
+
+    stats  = stats if stats is not None else SearchStats()
+    start  = monotonic()
+    best, nodes = solve_twophase(cube, stats=stats)
+    length = solution_length(best)
+    yield best, nodes
+    twist, flip, slice = coordinates(*from_state(cube.state))
+    while True:
+        remaining_time  = None if timeout is None else \
+                          timeout - (monotonic() - start)
+        remaining_nodes = None if max_nodes is None else max_nodes - nodes
+        if (remaining_time is not None and remaining_time <= 0) or \
+           (remaining_nodes is not None and remaining_nodes <= 0):
+            break
+        search = _Search(cube, length - 1, remaining_time, stats, length,
+                         remaining_nodes)
+        search.run(twist, flip, slice)
+        nodes += search.nodes
+        if search.best is None:
+            break
+        best, length = search.best, search.best_length
+        yield best, nodes
+    stats.finish()